@@ -0,0 +1,149 @@
+'''
+Token authentication with users cached by token.
+
+Users resolved by tokens are kept in a bounded process-local LRU for
+a short time and, when the default cache is shared by processes, in it
+for longer. Logout, deletion of tokens and changes of users drop the
+cached entries; other processes notice it when their local entries
+expire. A process-local default cache is not used, as other processes
+would keep accepting a revoked token until its entry expires.
+'''
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_logged_out
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.caches import is_cache_shared
+
+User = get_user_model()
+
+# Password hashes are not cached, the field is loaded on access.
+USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname != 'password'
+)
+TOKEN_FIELDS = ('key', 'user_id', 'created')
+
+
+class LRUCache:
+    ''' Thread-safe bounded mapping which entries expire after timeout. '''
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_local_cache = LRUCache(
+    settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_LOCAL_TIMEOUT
+)
+
+
+def _get_key(token_key):
+    # Tokens are not stored in cache keys as is.
+    digest = hashlib.sha256(token_key.encode()).hexdigest()
+    return 'auth:token:{}'.format(digest)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+    Token authentication which resolves tokens to users through
+    the local and the shared cache before the database.
+    '''
+
+    def authenticate_credentials(self, key):
+        cache_key = _get_key(key)
+        snapshot = _local_cache.get(cache_key)
+        if snapshot is None:
+            shared = is_cache_shared()
+            snapshot = cache.get(cache_key) if shared else None
+            if snapshot is None:
+                user, token = super().authenticate_credentials(key)
+                snapshot = (
+                    [getattr(user, field) for field in USER_FIELDS],
+                    token.created,
+                )
+                if shared:
+                    cache.set(
+                        cache_key, snapshot, settings.TOKEN_CACHE_TIMEOUT
+                    )
+            _local_cache.set(cache_key, snapshot)
+        user_values, created = snapshot
+        user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, user_values)
+        token = Token.from_db(
+            DEFAULT_DB_ALIAS, TOKEN_FIELDS, (key, user.id, created)
+        )
+        token.user = user
+        return user, token
+
+
+def invalidate_token(token_key):
+    ''' Drop the cached user of token after the transaction commits. '''
+    cache_key = _get_key(token_key)
+
+    def invalidate():
+        _local_cache.delete(cache_key)
+        cache.delete(cache_key)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    ''' Forget the deleted token. '''
+    invalidate_token(instance.key)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_token(sender, request, user, **kwargs):
+    ''' Forget the token of the logged out request. '''
+    token = getattr(request, 'auth', None)
+    if isinstance(token, Token):
+        invalidate_token(token.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    '''
+    Forget tokens of the changed user, so changes of flags like
+    'is_active' and 'is_staff' apply to authenticated requests.
+    '''
+    if created:
+        return
+    for key in Token.objects.filter(user_id=instance.id).values_list(
+            'key', flat=True):
+        invalidate_token(key)
@@ -0,0 +1,301 @@
+''' Shopping cart export for API. '''
+
+import csv
+import functools
+import io
+import os
+import struct
+import zlib
+
+from django.conf import settings
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.validators import ValidationError
+
+from .fonts import TrueTypeFont
+
+
+class ExportUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The file format is temporarily unavailable.')
+    default_code = 'export_unavailable'
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(path):
+    '''
+    Return the TrueType font embedded in PDF files, loaded once per
+    process. Without it Cyrillic text can't be rendered, so a missing
+    font is an error instead of a fallback.
+    '''
+    try:
+        with open(path, 'rb') as file:
+            return TrueTypeFont(
+                file.read(), os.path.splitext(os.path.basename(path))[0]
+            )
+    except (OSError, KeyError, struct.error):
+        raise ExportUnavailable
+
+
+def get_shopping_cart_rows(user):
+    '''
+    Iterate over (name, measurement_unit, amount) rows of the ingredients
+    summary for recipes in user shopping cart, ordered by name.
+    '''
+    ingredient = 'recipe__ingredients__ingredient__'
+    return (
+        user.shopping_cart
+            .filter(recipe__ingredients__isnull=False)
+            .values_list(ingredient + 'name', ingredient + 'measurement_unit')
+            .annotate(summary=Sum('recipe__ingredients__amount'))
+            .order_by(ingredient + 'name', ingredient + 'measurement_unit')
+            .iterator()
+    )
+
+
+class ShoppingCartExporter:
+    '''
+    Base class for shopping cart exporters. Iteration over an exporter
+    yields chunks of the file content.
+    '''
+    content_type = None
+    extension = None
+    rows_per_chunk = 500
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def format_rows(self, rows):
+        raise NotImplementedError
+
+    def __iter__(self):
+        chunk = []
+        for row in self.rows:
+            chunk.append(row)
+            if len(chunk) == self.rows_per_chunk:
+                yield self.format_rows(chunk)
+                chunk = []
+        if chunk:
+            yield self.format_rows(chunk)
+
+
+class TextExporter(ShoppingCartExporter):
+    ''' Exports shopping cart as plain text lines. '''
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def format_rows(self, rows):
+        return ''.join(
+            '{} {}{}\n'.format(name, amount, measurement_unit)
+            for name, measurement_unit, amount in rows
+        ).encode()
+
+
+class CSVExporter(ShoppingCartExporter):
+    ''' Exports shopping cart as CSV table with header. '''
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def format_rows(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            (name, amount, measurement_unit)
+            for name, measurement_unit, amount in rows
+        )
+        return buffer.getvalue().encode()
+
+    def __iter__(self):
+        yield self.format_rows(
+            [(_('Name'), _('Measurement unit'), _('Amount'))]
+        )
+        yield from super().__iter__()
+
+
+class PDFExporter(ShoppingCartExporter):
+    '''
+    Exports shopping cart as PDF document with text in an embedded font.
+    Pages are written right away, the font with only the used glyphs
+    is written after them, only object offsets and used glyphs are kept
+    until the end.
+    '''
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    media_box = (595, 842)
+    margin = 50
+    font_size = 12
+    line_height = 18
+    # Objects written after pages.
+    catalog, pages, font, cid_font, descriptor, font_file, to_unicode = (
+        range(1, 8)
+    )
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        # Loaded before the response starts, so a missing font is
+        # reported with an error status instead of a truncated file.
+        self.font_file_data = get_font(settings.EXPORT_FONT)
+        self.glyphs = {}
+
+    def encode(self, text):
+        ''' Return text as a hex string of glyph ids. '''
+        cmap = self.font_file_data.cmap
+        codes = []
+        for character in text:
+            glyph = cmap.get(character, 0)
+            if glyph:
+                self.glyphs.setdefault(glyph, character)
+            codes.append('%04X' % glyph)
+        return ''.join(codes).encode()
+
+    def render_pages(self):
+        ''' Yield content streams of document pages. '''
+        lines_per_page = (
+            (self.media_box[1] - 2 * self.margin) // self.line_height
+        )
+        lines = []
+        for index, (name, measurement_unit, amount) in enumerate(self.rows):
+            if index and index % lines_per_page == 0:
+                yield self.render_page(lines)
+                lines = []
+            lines.append(self.encode(
+                '{} {}{}'.format(name, amount, measurement_unit)
+            ))
+        yield self.render_page(lines)
+
+    def render_page(self, lines):
+        top = self.media_box[1] - self.margin - self.font_size
+        return b'BT /F1 %d Tf %d TL %d %d Td\n%s\nET' % (
+            self.font_size, self.line_height, self.margin, top,
+            b'\n'.join(b'<%s> Tj T*' % line for line in lines)
+        )
+
+    def get_widths(self):
+        font = self.font_file_data
+        return b' '.join(
+            b'%d [%d]' % (glyph, font.scale(font.advances[glyph]))
+            for glyph in sorted(self.glyphs)
+        )
+
+    def get_to_unicode(self):
+        ''' Return CMap mapping used glyph ids back to characters. '''
+        glyphs = sorted(self.glyphs.items())
+        blocks = []
+        for start in range(0, len(glyphs), 100):
+            block = glyphs[start:start + 100]
+            blocks.append(b'%d beginbfchar\n%s\nendbfchar' % (
+                len(block), b'\n'.join(
+                    b'<%04X> <%s>' % (
+                        glyph, character.encode('utf-16-be').hex().encode()
+                    ) for glyph, character in block
+                )
+            ))
+        return (
+            b'/CIDInit /ProcSet findresource begin\n12 dict begin\n'
+            b'begincmap\n/CIDSystemInfo << /Registry (Adobe) '
+            b'/Ordering (UCS) /Supplement 0 >> def\n'
+            b'/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+            b'1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n'
+            + b'\n'.join(blocks)
+            + b'\nendcmap\nCMapName currentdict /CMap defineresource pop\n'
+            b'end\nend'
+        )
+
+    def __iter__(self):
+        offsets = {}
+        position = 0
+
+        def write(number, body, stream=None):
+            nonlocal position
+            offsets[number] = position
+            data = b'%d 0 obj\n' % number + body
+            if stream is not None:
+                data += b'\nstream\n' + stream + b'\nendstream'
+            data += b'\nendobj\n'
+            position += len(data)
+            return data
+
+        def write_stream(number, stream, entries=b''):
+            stream = zlib.compress(stream)
+            return write(number, b'<< /Filter /FlateDecode /Length %d%s >>' % (
+                len(stream), entries
+            ), stream)
+
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        position = len(header)
+        yield header
+        yield write(self.catalog, b'<< /Type /Catalog /Pages %d 0 R >>' % (
+            self.pages
+        ))
+        kids = []
+        number = self.to_unicode + 1
+        for content in self.render_pages():
+            yield write_stream(number, content)
+            yield write(number + 1, (
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d]'
+                b' /Resources << /Font << /F1 %d 0 R >> >>'
+                b' /Contents %d 0 R >>'
+            ) % (self.pages, *self.media_box, self.font, number))
+            kids.append(b'%d 0 R' % (number + 1))
+            number += 2
+        yield write(self.pages, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(kids), len(kids)
+        ))
+        font = self.font_file_data
+        name = b'AAAAAA+' + font.name
+        yield write(self.font, (
+            b'<< /Type /Font /Subtype /Type0 /BaseFont /%s'
+            b' /Encoding /Identity-H /DescendantFonts [%d 0 R]'
+            b' /ToUnicode %d 0 R >>'
+        ) % (name, self.cid_font, self.to_unicode))
+        yield write(self.cid_font, (
+            b'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s'
+            b' /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity)'
+            b' /Supplement 0 >> /FontDescriptor %d 0 R'
+            b' /CIDToGIDMap /Identity /W [%s] >>'
+        ) % (name, self.descriptor, self.get_widths()))
+        yield write(self.descriptor, (
+            b'<< /Type /FontDescriptor /FontName /%s /Flags 4'
+            b' /FontBBox [%d %d %d %d] /ItalicAngle 0 /Ascent %d'
+            b' /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>'
+        ) % (name, *font.bbox, font.ascent, font.descent, font.ascent,
+             self.font_file))
+        font_file = font.subset(self.glyphs)
+        yield write_stream(self.font_file, font_file,
+                           b' /Length1 %d' % len(font_file))
+        yield write_stream(self.to_unicode, self.get_to_unicode())
+        xref = [b'xref\n0 %d\n' % number, b'0000000000 65535 f \n']
+        xref.extend(b'%010d 00000 n \n' % offsets[object_number]
+                    for object_number in range(1, number))
+        yield b''.join(xref) + (
+            b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n'
+            b'%%%%EOF\n'
+        ) % (number, self.catalog, position)
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TextExporter, CSVExporter, PDFExporter)
+}
+
+
+def get_shopping_cart_file(user, file_format):
+    ''' Get a streaming response with shopping cart file. '''
+    try:
+        exporter = EXPORTERS[file_format]
+    except KeyError:
+        raise ValidationError(
+            _('Invalid file format. Choose one of: {formats}.').format(
+                formats=', '.join(EXPORTERS)
+            )
+        )
+    response = StreamingHttpResponse(
+        exporter(get_shopping_cart_rows(user)),
+        content_type=exporter.content_type,
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="shopping_cart.{}"'.format(exporter.extension)
+    )
+    return response
@@ -1,10 +1,92 @@
 ''' Fields for API. '''
 
-from drf_extra_fields.fields import Base64ImageField
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import (TemporaryUploadedFile,
+                                            UploadedFile)
+from django.utils.translation import gettext_lazy as _
+from drf_extra_fields.fields import DEFAULT_CONTENT_TYPE, Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+from recipes.renditions import get_rendition_urls
 
 
 class Base64ImageFieldRelativePath(Base64ImageField):
-    ''' Base64ImageField with relative path in representattion. '''
+    '''
+    Base64ImageField with relative path in representattion.
+
+    Accepts base64 strings and uploaded files from multipart forms.
+    Base64 data is decoded by chunks to a temporary file, size and
+    pixel count limits are checked by the image header before
+    the image is decoded.
+    '''
+    default_error_messages = {
+        'too_large': _('The image must not be larger than {max_size} bytes.'),
+        'too_many_pixels': _(
+            'The image must not have more than {max_pixels} pixels.'
+        ),
+    }
+    decode_chunk_size = 64 * 1024 * 4
+
+    def decode_to_file(self, data):
+        ''' Decode base64 string to a temporary uploaded file. '''
+        if ';base64,' in data[:256]:
+            data = data[data.index(';base64,') + len(';base64,'):]
+        if len(data) // 4 * 3 > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail('too_large', max_size=settings.IMAGE_UPLOAD_MAX_SIZE)
+        file = TemporaryUploadedFile('', DEFAULT_CONTENT_TYPE, 0, None)
+        try:
+            for start in range(0, len(data), self.decode_chunk_size):
+                file.write(base64.b64decode(
+                    data[start:start + self.decode_chunk_size], validate=True
+                ))
+        except (binascii.Error, ValueError):
+            file.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+    def check_image_header(self, file):
+        '''
+        Check the image by its header only and return the file extension.
+        '''
+        if file.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail('too_large', max_size=settings.IMAGE_UPLOAD_MAX_SIZE)
+        try:
+            image = Image.open(file)
+        except (OSError, Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        width, height = image.size
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.fail(
+                'too_many_pixels',
+                max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS
+            )
+        file.seek(0)
+        extension = (image.format or '').lower()
+        extension = 'jpg' if extension == 'jpeg' else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        return extension
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, str):
+            file = self.decode_to_file(data)
+        elif isinstance(data, UploadedFile):
+            file = data
+        else:
+            return super().to_internal_value(data)
+        extension = self.check_image_header(file)
+        file.name = '{}.{}'.format(uuid.uuid4(), extension)
+        return serializers.ImageField.to_internal_value(self, file)
+
     def to_representation(self, file):
         if self.represent_in_base64:
             return super().to_representation(file)
@@ -18,3 +100,12 @@ class Base64ImageFieldRelativePath(Base64ImageField):
                 except AttributeError:
                     return None
             return file.name
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    '''
+    Field with srcset-style map of image rendition urls
+    by format and width.
+    '''
+    def to_representation(self, file):
+        return get_rendition_urls(file)
@@ -0,0 +1,213 @@
+'''
+TrueType fonts embedded in exported PDF documents.
+
+Only glyphs used by a document are embedded: glyph ids are kept, so
+text is written with 2-byte glyph ids under the Identity-H encoding,
+and outlines of unused glyphs are left empty.
+'''
+
+import re
+import struct
+
+# Tables needed by PDF readers to render glyphs of an embedded font.
+SUBSET_TABLES = (
+    b'cvt ', b'fpgm', b'glyf', b'head', b'hhea', b'hmtx', b'loca', b'maxp',
+    b'prep',
+)
+# Flags of components of composite glyphs.
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+class TrueTypeFont:
+    ''' Metrics, character map and glyph outlines of a TrueType font. '''
+
+    def __init__(self, data, name):
+        self.data = data
+        # PostScript name of the font for PDF.
+        self.name = re.sub(r'[^A-Za-z0-9-]', '', name).encode() or b'Font'
+        num_tables = struct.unpack_from('>H', data, 4)[0]
+        self.tables = {}
+        for index in range(num_tables):
+            tag, _, offset, length = struct.unpack_from(
+                '>4sLLL', data, 12 + 16 * index
+            )
+            self.tables[tag] = (offset, length)
+        head = self.get_table(b'head')
+        self.units_per_em = struct.unpack_from('>H', head, 18)[0]
+        self.bbox = [self.scale(value)
+                     for value in struct.unpack_from('>4h', head, 36)]
+        long_offsets = struct.unpack_from('>h', head, 50)[0]
+        hhea = self.get_table(b'hhea')
+        ascent, descent = struct.unpack_from('>hh', hhea, 4)
+        self.ascent, self.descent = self.scale(ascent), self.scale(descent)
+        number_of_h_metrics = struct.unpack_from('>H', hhea, 34)[0]
+        self.num_glyphs = struct.unpack_from(
+            '>H', self.get_table(b'maxp'), 4
+        )[0]
+        advances = struct.unpack_from(
+            '>' + 'Hh' * number_of_h_metrics, self.get_table(b'hmtx')
+        )[::2]
+        self.advances = advances + (advances[-1],) * (
+            self.num_glyphs - number_of_h_metrics
+        )
+        loca = self.get_table(b'loca')
+        if long_offsets:
+            self.loca = struct.unpack_from(
+                '>%dL' % (self.num_glyphs + 1), loca
+            )
+        else:
+            self.loca = tuple(offset * 2 for offset in struct.unpack_from(
+                '>%dH' % (self.num_glyphs + 1), loca
+            ))
+        self.cmap = self.read_cmap()
+
+    def get_table(self, tag):
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def scale(self, value):
+        ''' Return font units in thousandths of the text size. '''
+        return round(value * 1000 / self.units_per_em)
+
+    def read_cmap(self):
+        ''' Return dict of glyph ids by characters of the Unicode cmap. '''
+        cmap = self.get_table(b'cmap')
+        num_subtables = struct.unpack_from('>H', cmap, 2)[0]
+        subtables = {}
+        for index in range(num_subtables):
+            platform, encoding, offset = struct.unpack_from(
+                '>HHL', cmap, 4 + 8 * index
+            )
+            subtables[platform, encoding] = offset
+        offset = subtables.get((3, 10))
+        if offset is not None:
+            return self.read_cmap_format_12(cmap, offset)
+        return self.read_cmap_format_4(cmap, subtables[3, 1])
+
+    def read_cmap_format_4(self, cmap, offset):
+        segments = struct.unpack_from('>H', cmap, offset + 6)[0] // 2
+        arrays = offset + 14
+        ends = struct.unpack_from('>%dH' % segments, cmap, arrays)
+        arrays += 2 * segments + 2
+        starts = struct.unpack_from('>%dH' % segments, cmap, arrays)
+        arrays += 2 * segments
+        deltas = struct.unpack_from('>%dh' % segments, cmap, arrays)
+        arrays += 2 * segments
+        range_offsets = struct.unpack_from('>%dH' % segments, cmap, arrays)
+        characters = {}
+        for index in range(segments):
+            for code in range(starts[index], ends[index] + 1):
+                if code == 0xFFFF:
+                    break
+                if range_offsets[index]:
+                    position = (arrays + 2 * index + range_offsets[index]
+                                + 2 * (code - starts[index]))
+                    glyph = struct.unpack_from('>H', cmap, position)[0]
+                    if glyph:
+                        glyph = (glyph + deltas[index]) % 0x10000
+                else:
+                    glyph = (code + deltas[index]) % 0x10000
+                if glyph:
+                    characters[chr(code)] = glyph
+        return characters
+
+    def read_cmap_format_12(self, cmap, offset):
+        groups = struct.unpack_from('>L', cmap, offset + 12)[0]
+        characters = {}
+        for index in range(groups):
+            start, end, glyph = struct.unpack_from(
+                '>LLL', cmap, offset + 16 + 12 * index
+            )
+            for code in range(start, end + 1):
+                characters[chr(code)] = glyph + code - start
+        return characters
+
+    def get_glyph(self, glyph):
+        return self.data[
+            self.tables[b'glyf'][0] + self.loca[glyph]:
+            self.tables[b'glyf'][0] + self.loca[glyph + 1]
+        ]
+
+    def get_components(self, glyph):
+        ''' Return ids of glyphs which the composite glyph consists of. '''
+        data = self.get_glyph(glyph)
+        if len(data) < 10 or struct.unpack_from('>h', data, 0)[0] >= 0:
+            return []
+        components = []
+        position = 10
+        while True:
+            flags, component = struct.unpack_from('>HH', data, position)
+            components.append(component)
+            position += 4
+            position += 4 if flags & ARG_1_AND_2_ARE_WORDS else 2
+            if flags & WE_HAVE_A_SCALE:
+                position += 2
+            elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                position += 4
+            elif flags & WE_HAVE_A_TWO_BY_TWO:
+                position += 8
+            if not flags & MORE_COMPONENTS:
+                return components
+
+    def subset(self, glyphs):
+        '''
+        Return the font file with outlines of only the given glyphs,
+        components of composite glyphs and the '.notdef' glyph.
+        '''
+        kept = {0}
+        pending = list(glyphs)
+        while pending:
+            glyph = pending.pop()
+            if glyph not in kept:
+                kept.add(glyph)
+                pending.extend(self.get_components(glyph))
+        glyf = bytearray()
+        loca = [0]
+        for glyph in range(self.num_glyphs):
+            if glyph in kept:
+                glyf += self.get_glyph(glyph)
+                glyf += b'\0' * (-len(glyf) % 4)
+            loca.append(len(glyf))
+        head = bytearray(self.get_table(b'head'))
+        # Zero checksum adjustment and long offsets in 'loca'.
+        struct.pack_into('>L', head, 8, 0)
+        struct.pack_into('>h', head, 50, 1)
+        tables = {
+            tag: self.get_table(tag)
+            for tag in SUBSET_TABLES if tag in self.tables
+        }
+        tables.update({
+            b'glyf': bytes(glyf),
+            b'head': bytes(head),
+            b'loca': struct.pack('>%dL' % len(loca), *loca),
+        })
+        return pack_tables(tables)
+
+
+def get_checksum(data):
+    data += b'\0' * (-len(data) % 4)
+    return sum(struct.unpack('>%dL' % (len(data) // 4), data)) % 0x100000000
+
+
+def pack_tables(tables):
+    ''' Return a font file with the dict of tables by tags. '''
+    count = len(tables)
+    power = 1 << (count.bit_length() - 1)
+    header = struct.pack(
+        '>LHHHH', 0x00010000, count, power * 16, power.bit_length() - 1,
+        (count - power) * 16
+    )
+    records = []
+    body = bytearray()
+    offset = len(header) + 16 * count
+    for tag in sorted(tables):
+        data = tables[tag]
+        records.append(struct.pack(
+            '>4sLLL', tag, get_checksum(data), offset + len(body), len(data)
+        ))
+        body += data + b'\0' * (-len(data) % 4)
+    return header + b''.join(records) + bytes(body)
@@ -1,12 +1,81 @@
 ''' Mixins classes for API. '''
 
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.middleware import record_timing
+from recipes.relations import get_relation_ids
 
 
 class SerializerMethodFieldMixin(serializers.Serializer):
 
-    def get_exists(self, related_manager, **kwargs):
-        user = self.context['request'].user
-        return (False if user.is_anonymous else getattr(
-            user, related_manager
-        ).filter(**kwargs).exists())
+    def get_exists(self, relation, id):
+        request = self.context['request']
+        return (False if request is None or request.user.is_anonymous
+                else id in get_relation_ids(request, relation))
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    ''' ListSerializer class recording its data as 'serialize' timing. '''
+
+    @property
+    def data(self):
+        with record_timing(self.context.get('request'), 'serialize'):
+            return super().data
+
+
+class TimedSerializerMixin(serializers.Serializer):
+    '''
+    Mixin recording data of a single object as 'serialize' timing of the
+    request, lists are recorded by TimedListSerializer set in Meta.
+    '''
+
+    @property
+    def data(self):
+        with record_timing(self.context.get('request'), 'serialize'):
+            return super().data
+
+
+class CatalogViewMixin:
+    '''
+    Mixin for read only viewsets of a catalog. Responses are validated
+    by the catalog version, so conditional requests are answered with
+    304 without touching the database, and the list payload is cached
+    for every version.
+    '''
+    catalog = None
+
+    def get_etag(self, request, *args, **kwargs):
+        return '{}-{:.6f}'.format(
+            self.catalog.model._meta.model_name, self.catalog_version
+        )
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return datetime.fromtimestamp(self.catalog_version, timezone.utc)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.catalog_version = self.catalog.version
+        view = condition(
+            etag_func=self.get_etag,
+            last_modified_func=self.get_last_modified,
+        )(super().dispatch)
+        response = view(request, *args, **kwargs)
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        key = '{}:list:{!r}'.format(
+            self.catalog.version_key, self.catalog_version
+        )
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data)
+        return Response(data)
@@ -0,0 +1,14 @@
+''' Content negotiation classes for API. '''
+
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    '''
+    Content negotiation class that leaves 'format' query parameter
+    to the view, e.g. to choose a format of the downloaded file.
+    '''
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
@@ -1,11 +1,120 @@
 ''' Pagination classes for API. '''
 
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(item, ordering):
+    ''' Return cursor of keyset pagination positioned at the item. '''
+    values = []
+    for name in ordering:
+        value = getattr(item, name.lstrip('-'))
+        if isinstance(value, datetime):
+            # Keep microseconds, which DjangoJSONEncoder truncates.
+            value = value.isoformat()
+        values.append(value)
+    return base64.urlsafe_b64encode(
+        json.dumps(values, cls=DjangoJSONEncoder).encode()
+    ).decode()
 
 
 class PageNumberLimitPagination(PageNumberPagination):
     '''
     PageNumberPagination class that supports page size as
     query parameter 'limit'.
+
+    Views with 'cursor_ordering' attribute also support keyset pagination
+    by the ordering fields, enabled by query parameter 'cursor' (empty for
+    the first page). It needs neither COUNT nor OFFSET, so any page costs
+    the same as the first one.
     '''
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = getattr(view, 'cursor_ordering', None)
+        if (self.cursor_ordering is None
+                or self.cursor_query_param not in request.query_params):
+            self.cursor_ordering = None
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_queryset_by_cursor(queryset, request)
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        cursor = request.query_params[self.cursor_query_param]
+        queryset = queryset.order_by(*self.cursor_ordering)
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(queryset.model, cursor)
+            )
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_keyset_filter(self, model, cursor):
+        '''
+        Return condition selecting items after the cursor position:
+        (a < x) or (a = x and b < y) and so on for ordering fields.
+        '''
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            fields = [name.lstrip('-') for name in self.cursor_ordering]
+            if len(values) != len(fields):
+                raise ValueError
+            values = [model._meta.get_field(field).to_python(value)
+                      for field, value in zip(fields, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        condition = Q()
+        equal = {}
+        for name, field, value in zip(self.cursor_ordering, fields, values):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        # The redundant bound of the first field lets the database scan
+        # the index range after the cursor, the disjunction alone is
+        # applied as a filter to every row before it.
+        if len(fields) == 1:
+            return condition
+        lookup = 'lte' if self.cursor_ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{fields[0]}__{lookup}': values[0]}) & condition
+
+    def encode_cursor(self, item):
+        return encode_cursor(item, self.cursor_ordering)
+
+    def get_next_link(self):
+        if self.cursor_ordering is None:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_ordering is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
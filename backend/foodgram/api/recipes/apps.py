@@ -8,3 +8,6 @@ class RecipesConfig(AppConfig):
     Encapsulate config options for 'recipes' API application.
     '''
     name = label = 'api.recipes'
+
+    def ready(self):
+        from . import documents  # noqa: F401
@@ -0,0 +1,208 @@
+'''
+Read model of recipes: precomputed representations of recipes without
+per-user data, rebuilt after writes and stitched with user flags
+on reads.
+'''
+
+import json
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.middleware import record_timing
+from recipes.catalog import catalog_changed
+from recipes.models import (Ingredient, Recipe, RecipeDocument,
+                            RecipeIngredient, RecipeTag, Tag)
+from recipes.relations import get_relation_ids
+from .serializers import RecipeSerializer
+
+User = get_user_model()
+
+DOCUMENTS_BATCH_SIZE = 500
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+_pending = threading.local()
+
+
+def with_relations(queryset):
+    ''' Load recipe relations rendered by RecipeSerializer in bulk. '''
+    return queryset.select_related('author').prefetch_related(
+        Prefetch('tags', queryset=RecipeTag.objects.select_related('tag')),
+        Prefetch('ingredients', queryset=(
+            RecipeIngredient.objects.select_related('ingredient')
+        )),
+    )
+
+
+def build_documents(recipe_ids):
+    '''
+    Return dict of documents by recipe ids. A document is the
+    RecipeSerializer representation for an anonymous user in JSON.
+    '''
+    recipes = with_relations(Recipe.objects.filter(id__in=recipe_ids))
+    data = RecipeSerializer(recipes, many=True, context={'request': None})
+    return {
+        item['id']: json.dumps(item, ensure_ascii=False)
+        for item in data.data
+    }
+
+
+def save_documents(documents):
+    '''
+    Insert or replace stored documents with the given dict of documents
+    with a single INSERT ... ON CONFLICT DO UPDATE statement, so
+    concurrent rebuilds of the same recipes do not conflict.
+    '''
+    if not documents:
+        return
+    quote = connection.ops.quote_name
+    meta = RecipeDocument._meta
+    recipe, data, updated = (
+        quote(meta.get_field(name).column)
+        for name in ('recipe', 'data', 'updated')
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(meta.db_table)} ({recipe}, {data}, '
+            f'{updated}) VALUES '
+            + ', '.join(['(%s, %s, %s)'] * len(documents))
+            + f' ON CONFLICT ({recipe}) DO UPDATE SET '
+            f'{data} = EXCLUDED.{data}, {updated} = EXCLUDED.{updated}',
+            [value for recipe_id, document in documents.items()
+             for value in (recipe_id, document, now)]
+        )
+
+
+def insert_documents(documents):
+    '''
+    Insert documents built on read. Documents stored meanwhile by
+    concurrent requests or rebuilds are kept.
+    '''
+    RecipeDocument.objects.bulk_create([
+        RecipeDocument(recipe_id=recipe_id, data=data)
+        for recipe_id, data in documents.items()
+    ], ignore_conflicts=True)
+
+
+def rebuild_documents(recipe_ids=None, batch_size=DOCUMENTS_BATCH_SIZE):
+    '''
+    Rebuild documents of recipes by ids, or of all recipes, in batches.
+    Return number of rebuilt documents.
+    '''
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        )
+    recipe_ids = list(recipe_ids)
+    rebuilt = 0
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        documents = build_documents(batch)
+        if len(documents) < len(batch):
+            RecipeDocument.objects.filter(recipe_id__in=batch).exclude(
+                recipe_id__in=documents
+            ).delete()
+        save_documents(documents)
+        rebuilt += len(documents)
+    return rebuilt
+
+
+def _rebuild_pending():
+    recipe_ids, _pending.recipe_ids = _pending.recipe_ids, set()
+    rebuild_documents(sorted(recipe_ids))
+
+
+def schedule_rebuild(recipe_ids):
+    '''
+    Rebuild documents of recipes after the current transaction commits.
+    Recipes changed in one transaction are rebuilt together once.
+    '''
+    if not hasattr(_pending, 'recipe_ids'):
+        _pending.recipe_ids = set()
+    _pending.recipe_ids.update(recipe_ids)
+    connection = transaction.get_connection()
+    if not any(func is _rebuild_pending
+               for _, func in connection.run_on_commit):
+        transaction.on_commit(_rebuild_pending)
+
+
+def get_documents(recipes, request):
+    '''
+    Return representations of recipes from their documents with flags
+    of the request user and current counters, which are updated without
+    rebuilding documents. Missing documents are built on the fly.
+    Building and stitching of documents is the 'serialize' timing.
+    '''
+    documents = {}
+    for recipe in recipes:
+        document = getattr(recipe, 'document', None)
+        if document is not None:
+            documents[recipe.id] = document.data
+    missing = [recipe.id for recipe in recipes if recipe.id not in documents]
+    if missing:
+        with record_timing(request, 'serialize'):
+            built = build_documents(missing)
+        insert_documents(built)
+        documents.update(built)
+    user = request.user
+    favorites = shopping_cart = subscriptions = frozenset()
+    if user.is_authenticated:
+        favorites = get_relation_ids(request, 'favorite_recipes')
+        shopping_cart = get_relation_ids(request, 'shopping_cart')
+        subscriptions = get_relation_ids(request, 'subscriptions')
+    data = []
+    with record_timing(request, 'serialize'):
+        for recipe in recipes:
+            item = json.loads(documents[recipe.id])
+            item['author']['is_subscribed'] = (
+                recipe.author_id in subscriptions
+            )
+            item['is_favorited'] = recipe.id in favorites
+            item['is_in_shopping_cart'] = recipe.id in shopping_cart
+            item['favorites_count'] = recipe.favorites_count
+            item['in_carts_count'] = recipe.in_carts_count
+            data.append(item)
+    return data
+
+
+@receiver(post_save, sender=Recipe)
+def rebuild_recipe_document(sender, instance, **kwargs):
+    '''
+    Rebuild the document of the saved recipe. Tags and ingredients are
+    written together with the recipe, writers changing only them
+    schedule the rebuild themselves.
+    '''
+    schedule_rebuild([instance.id])
+
+
+@receiver(post_save, sender=User)
+def rebuild_author_documents(sender, instance, created, update_fields,
+                             **kwargs):
+    ''' Rebuild documents of recipes of the changed author. '''
+    if created or (update_fields is not None
+                   and not AUTHOR_FIELDS & update_fields):
+        return
+    recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    if recipe_ids:
+        schedule_rebuild(recipe_ids)
+
+
+@receiver(catalog_changed, sender=Tag)
+@receiver(catalog_changed, sender=Ingredient)
+def rebuild_catalog_documents(sender, ids, **kwargs):
+    ''' Rebuild documents of recipes with changed tags or ingredients. '''
+    if not ids:
+        return
+    model = RecipeTag if sender is Tag else RecipeIngredient
+    field = 'tag_id__in' if sender is Tag else 'ingredient_id__in'
+    recipe_ids = set(model.objects.filter(
+        **{field: ids}
+    ).values_list('recipe_id', flat=True))
+    if recipe_ids:
+        schedule_rebuild(recipe_ids)
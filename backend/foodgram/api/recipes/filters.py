@@ -1,16 +1,67 @@
 ''' Filter classes for 'recipes' API application. '''
 
-from rest_framework.filters import SearchFilter
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+from rest_framework.filters import BaseFilterBackend
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, User
+from recipes.catalog import tag_catalog
+from recipes.fulltext import search_recipes
+from recipes.models import Recipe, RecipeTag
+from recipes.relations import get_relation_ids
+from recipes.search import get_ingredient_index
+
+ORDERINGS = {
+    'popular': ('-favorites_count', '-created', '-id'),
+}
+
+
+def get_tag_choices():
+    return {tag.slug: tag.name for tag in tag_catalog.all()}.items()
+
+
+class TagsFilter(filters.MultipleChoiceFilter):
+    '''
+    Filter recipes by tag slugs with choices from the tag catalog.
+    Recipes are matched by EXISTS subqueries over recipe tags, so rows
+    are never duplicated. Matching is read from the 'match_param' filter
+    of the filterset: with 'all' a recipe must have every tag, with
+    'any' at least one of them.
+    '''
+
+    def __init__(self, *args, match_param=None, **kwargs):
+        kwargs.setdefault('choices', get_tag_choices)
+        self.match_param = match_param
+        super().__init__(*args, **kwargs)
+
+    def filter(self, queryset, value):
+        if not value:
+            return queryset
+        match = (self.parent.form.cleaned_data.get(self.match_param)
+                 if self.match_param else None)
+        tag_ids = {}
+        for tag in tag_catalog.all():
+            tag_ids.setdefault(tag.slug, []).append(tag.id)
+        groups = ([tag_ids[slug] for slug in value] if match == 'all'
+                  else [[id for slug in value for id in tag_ids[slug]]])
+        conditions = {}
+        for index, ids in enumerate(groups):
+            conditions[f'_has_tags_{index}'] = Exists(
+                RecipeTag.objects.filter(recipe=OuterRef('pk'),
+                                         tag_id__in=ids)
+            )
+        return queryset.annotate(**conditions).filter(
+            **{name: True for name in conditions}
+        )
 
 
 class RecipeFilter(FilterSet):
     ''' Filter class for :model:'recipes.Recipe'. '''
-    author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__tag__slug'
+    author = filters.NumberFilter(field_name='author_id')
+    tags = TagsFilter(match_param='tags_match')
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', _('Any')), ('all', _('All'))),
+        method='filter_tags_match'
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
@@ -18,29 +69,55 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', _('Popular')),),
+        method='filter_ordering'
+    )
+    # Larger sets are filtered with a subquery instead of a list of ids.
+    max_related_ids = 500
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags',)
 
-    def _filter_related(self, queryset, value, related_manager):
+    def _filter_related(self, queryset, value, relation):
         if value and not self.request.user.is_anonymous:
-            recipe_ids = related_manager.values_list(
-                'recipe', flat=True
-            )
+            recipe_ids = get_relation_ids(self.request, relation)
+            if len(recipe_ids) > self.max_related_ids:
+                recipe_ids = getattr(
+                    self.request.user, relation
+                ).values_list('recipe', flat=True)
             return queryset.filter(id__in=recipe_ids)
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
-        return self._filter_related(
-            queryset, value, self.request.user.favorite_recipes
-        )
+        return self._filter_related(queryset, value, 'favorite_recipes')
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        return self._filter_related(
-            queryset, value, self.request.user.shopping_cart
-        )
+        return self._filter_related(queryset, value, 'shopping_cart')
 
+    def filter_tags_match(self, queryset, name, value):
+        # Applied by 'tags' filter.
+        return queryset
 
-class IngredientFilter(SearchFilter):
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
+
+
+class IngredientFilter(BaseFilterBackend):
+    '''
+    Filter class for :model:'recipes.Ingredient' by name, served from
+    the in-memory index of the ingredient catalog.
+    '''
     search_param = 'name'
+    max_results = 50
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name or view.action != 'list':
+            return queryset
+        return get_ingredient_index().search(name, self.max_results)
@@ -0,0 +1,27 @@
+''' Command to rebuild precomputed documents of recipes. '''
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recipes.documents import DOCUMENTS_BATCH_SIZE, rebuild_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed API documents of all or given recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'ids', nargs='*', type=int,
+            help='Ids of recipes to rebuild, all recipes by default.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DOCUMENTS_BATCH_SIZE,
+            help='Number of recipes built in one batch.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+        rebuilt = rebuild_documents(
+            options['ids'] or None, options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt: {rebuilt}.'))
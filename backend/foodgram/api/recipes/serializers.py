@@ -1,14 +1,63 @@
 ''' Serializers for 'recipes' API application. '''
 
+from django.conf import settings
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
 
 from api import fields, mixins
 from api.users.serializers import UserSerializer
+from api.utils import get_recipes_limit
+from recipes.catalog import ingredient_catalog, tag_catalog
 from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
 
 
+class CatalogListSerializer(serializers.ListSerializer):
+    '''
+    ListSerializer class that resolves catalog entries referenced
+    by all items with a single lookup.
+    '''
+    catalog = None
+    error_message = None
+
+    def get_entry_id(self, item):
+        return item
+
+    def resolve(self, item, entry):
+        return entry
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ids = [self.get_entry_id(item) for item in items]
+        entries = self.catalog.get_many(ids)
+        unknown_ids = sorted(set(ids) - entries.keys())
+        if unknown_ids:
+            raise ValidationError(self.error_message.format(
+                ids=', '.join(str(id) for id in unknown_ids)
+            ))
+        return [self.resolve(item, entries[self.get_entry_id(item)])
+                for item in items]
+
+
+class RecipeTagListSerializer(CatalogListSerializer):
+    ''' ListSerializer class for :model:'recipes.RecipeTag'. '''
+    catalog = tag_catalog
+    error_message = _('Invalid data. No such tags: {ids}.')
+
+
+class RecipeIngredientListSerializer(CatalogListSerializer):
+    ''' ListSerializer class for :model:'recipes.RecipeIngredient'. '''
+    catalog = ingredient_catalog
+    error_message = _('Invalid data. No such ingredients: {ids}.')
+
+    def get_entry_id(self, item):
+        return item[0]
+
+    def resolve(self, item, entry):
+        return entry, item[1]
+
+
 class TagSerializer(serializers.ModelSerializer):
     ''' Serializer class for :model:'recipes.Tag'. '''
 
@@ -28,14 +77,11 @@ class RecipeTagSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeTag
         fields = ('id', 'name', 'color', 'slug')
+        list_serializer_class = RecipeTagListSerializer
 
     def to_internal_value(self, data):
         data = super().to_internal_value({'id': data})
-        try:
-            tag = Tag.objects.get(id=data['tag']['id'])
-        except Tag.DoesNotExist:
-            raise ValidationError(_('Invalid data. No such tag.'))
-        return tag
+        return data['tag']['id']
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -58,30 +104,30 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = RecipeIngredientListSerializer
 
     def to_internal_value(self, data):
         data = super().to_internal_value(data)
-        try:
-            ingredient = Ingredient.objects.get(id=data['ingredient']['id'])
-        except Ingredient.DoesNotExist:
-            raise ValidationError(_('Invalid data. No such tag.'))
-        return ingredient, data['amount']
+        return data['ingredient']['id'], data['amount']
 
 
 class RecipeSerializer(
         serializers.ModelSerializer,
-        mixins.SerializerMethodFieldMixin):
+        mixins.SerializerMethodFieldMixin,
+        mixins.TimedSerializerMixin):
     ''' Serializer class for :model:'recipes.Recipe'. '''
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(many=True)
     image = fields.Base64ImageFieldRelativePath(required=True)
+    image_srcset = fields.ImageRenditionsField(source='image')
     tags = RecipeTagSerializer(many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        exclude = ('created',)
+        exclude = ('created', 'fanned_out')
+        list_serializer_class = mixins.TimedListSerializer
 
     def validate_tags(self, value):
         if len(value) == 0:
@@ -111,13 +157,11 @@ class RecipeSerializer(
         return value
 
     def _set_tags(self, instance, tags):
-        instance.tags.all().delete()
         RecipeTag.objects.bulk_create(
             [RecipeTag(recipe=instance, tag=tag) for tag in tags]
         )
 
     def _set_ingredients(self, instance, ingredients):
-        instance.ingredients.all().delete()
         RecipeIngredient.objects.bulk_create(
             [RecipeIngredient(
                 recipe=instance,
@@ -125,6 +169,65 @@ class RecipeSerializer(
                 amount=amount) for ingredient, amount in ingredients]
         )
 
+    def _update_tags(self, instance, tags):
+        '''
+        Delete and insert only changed recipe tags.
+        Return True if anything changed.
+        '''
+        tag_ids = {tag.id for tag in tags}
+        current_ids = set(instance.tags.values_list('tag_id', flat=True))
+        removed_ids = current_ids - tag_ids
+        added_ids = tag_ids - current_ids
+        if removed_ids:
+            instance.tags.filter(tag_id__in=removed_ids).delete()
+        if added_ids:
+            RecipeTag.objects.bulk_create(
+                [RecipeTag(recipe=instance, tag_id=tag.id)
+                 for tag in tags if tag.id in added_ids]
+            )
+        return bool(removed_ids or added_ids)
+
+    def _update_ingredients(self, instance, ingredients):
+        '''
+        Delete, insert and update amounts of only changed recipe
+        ingredients. Return True if anything changed.
+        '''
+        amounts = {ingredient.id: amount for ingredient, amount in ingredients}
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in instance.ingredients.all()
+        }
+        removed_ids = current.keys() - amounts.keys()
+        added = [
+            RecipeIngredient(recipe=instance, ingredient_id=id, amount=amount)
+            for id, amount in amounts.items() if id not in current
+        ]
+        changed = []
+        for id, recipe_ingredient in current.items():
+            if id in amounts and recipe_ingredient.amount != amounts[id]:
+                recipe_ingredient.amount = amounts[id]
+                changed.append(recipe_ingredient)
+        if removed_ids:
+            instance.ingredients.filter(
+                ingredient_id__in=removed_ids
+            ).delete()
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        return bool(removed_ids or added or changed)
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        finally:
+            # The saved temporary image file is moved by the storage,
+            # close it here to not leave it to the garbage collector.
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -136,17 +239,39 @@ class RecipeSerializer(
         return recipe
 
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        self._set_ingredients(instance, ingredients)
-        self._set_tags(instance, tags)
-        return super().update(instance, validated_data)
+        '''
+        Write only the difference with the stored recipe, nothing
+        is written if the recipe is not changed.
+        '''
+        # Imported here, the documents are built by this serializer.
+        from .documents import schedule_rebuild
+
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        relations_changed = False
+        if ingredients is not None:
+            relations_changed |= self._update_ingredients(
+                instance, ingredients
+            )
+        if tags is not None:
+            relations_changed |= self._update_tags(instance, tags)
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
+        elif relations_changed:
+            schedule_rebuild([instance.id])
+        return instance
 
     def get_is_favorited(self, obj):
-        return self.get_exists('favorite_recipes', recipe=obj)
+        return self.get_exists('favorite_recipes', obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        return self.get_exists('shopping_cart', recipe=obj)
+        return self.get_exists('shopping_cart', obj.id)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
@@ -155,13 +280,24 @@ class RecipeShortSerializer(serializers.ModelSerializer):
     for :model:'recipes.RecipeIngredient'.
     '''
 
+    image_srcset = fields.ImageRenditionsField(source='image')
+
     class Meta:
         model = Recipe
         fields = read_only_fields = (
-            'id', 'name', 'image', 'cooking_time'
+            'id', 'name', 'image', 'image_srcset', 'cooking_time'
         )
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    ''' Serializer class for ids of objects in bulk actions. '''
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_SIZE,
+    )
+
+
 class UserSubscriptionSerializer(UserSerializer):
     ''' Serializer class for user subscriptions. '''
     recipes = serializers.SerializerMethodField()
@@ -172,18 +308,16 @@ class UserSubscriptionSerializer(UserSerializer):
                   + ('recipes', 'recipes_count',))
 
     def get_recipes(self, obj):
-        recipes = obj.recipes.all()
-        recipes_limit = (self.context['request'].query_params
-                                                .get('recipes_limit'))
-        if recipes_limit is not None:
-            try:
-                recipes_limit = int(recipes_limit)
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context['request'])
+            if recipes_limit is not None:
                 recipes = recipes[:recipes_limit]
-            except ValueError:
-                raise ValidationError(
-                    _('''Parameter 'recipes_limit' excepted a int type''')
-                )
         return RecipeShortSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.all().count()
@@ -0,0 +1,466 @@
+''' Tests for 'recipes' API application. '''
+
+import base64
+import io
+import json
+import os
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from api.recipes.documents import (build_documents, insert_documents,
+                                   rebuild_documents, with_relations)
+from api.recipes.serializers import RecipeSerializer
+from api.recipes.views import RecipeViewSet
+
+from core.plans import explain, get_full_scans, has_plan
+from core.seeding import seed_dataset
+from recipes.catalog import ingredient_catalog, tag_catalog
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeDocument, RecipeShoppingCart, RecipeTag,
+                            Tag, TimelineEntry)
+from users.models import UserSubscription
+
+
+class RecipeAPITestCase(TestCase):
+    ''' Seed a dataset and authenticate a client as its main user. '''
+    recipes_count = 40
+
+    def setUp(self):
+        cache.clear()
+        tag_catalog.invalidate()
+        ingredient_catalog.invalidate()
+        self.user, self.values = seed_dataset(self.recipes_count)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+
+    def get(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+class RecipeReadQueriesTest(RecipeAPITestCase):
+    '''
+    A page of recipes costs a fixed number of queries whatever its size:
+    per-user flags come from the relations cache, recipes are rendered
+    from documents loaded with the page.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        # Build missing documents and fill the relations cache.
+        self.get(f'/api/recipes/?limit={self.recipes_count}')
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for limit in (1, 6, self.recipes_count):
+            with self.subTest(limit=limit), self.assertNumQueries(2):
+                data = self.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(len(data['results']), limit)
+
+    def test_anonymous_list_queries(self):
+        for limit in (1, self.recipes_count):
+            with self.subTest(limit=limit), self.assertNumQueries(2):
+                self.get(f'/api/recipes/?limit={limit}', self.anonymous)
+
+    def test_cursor_page_queries(self):
+        with self.assertNumQueries(1):
+            data = self.get('/api/recipes/?cursor=&limit=10')
+        with self.assertNumQueries(1):
+            self.get(data['next'])
+
+    def test_detail_queries(self):
+        with self.assertNumQueries(1):
+            data = self.get(f'/api/recipes/{self.values["recipe"]}/')
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['author']['is_subscribed'])
+
+    def test_flags_are_read_without_queries_per_recipe(self):
+        with self.assertNumQueries(2):
+            data = self.get(
+                f'/api/recipes/?is_favorited=1&limit={self.recipes_count}'
+            )
+        self.assertEqual(data['count'], len(range(1, self.recipes_count, 3)))
+        self.assertTrue(all(item['is_favorited'] for item in data['results']))
+
+
+class RecipeFilterTest(RecipeAPITestCase):
+    '''
+    Filters by tags, author, favorites and shopping cart return every
+    matching recipe once, with a fixed number of queries and without
+    full scans of large tables besides recipes for tags alone.
+    '''
+    # Tags match a large share of recipes, so the planner may scan them.
+    allowed_full_scans = {
+        'tags': {'recipes_recipe'},
+        'tags_match': {'recipes_recipe'},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.get(f'/api/recipes/?limit={self.recipes_count}')
+        tag_catalog.all()
+
+    def get_expected_ids(self, params):
+        recipes = set(Recipe.objects.values_list('id', flat=True))
+        tags = params.get('tags', [])
+        if tags:
+            tagged = [
+                set(RecipeTag.objects.filter(
+                    tag__slug=slug
+                ).values_list('recipe_id', flat=True))
+                for slug in tags
+            ]
+            if params.get('tags_match') == 'all':
+                recipes &= set.intersection(*tagged)
+            else:
+                recipes &= set.union(*tagged)
+        if 'author' in params:
+            recipes &= set(Recipe.objects.filter(
+                author_id=params['author']
+            ).values_list('id', flat=True))
+        for param, model in (('is_favorited', FavoriteRecipe),
+                             ('is_in_shopping_cart', RecipeShoppingCart)):
+            if param in params:
+                recipes &= set(model.objects.filter(
+                    user=self.user
+                ).values_list('recipe_id', flat=True))
+        return recipes
+
+    def get_cases(self):
+        tag, other_tag = self.values['tag'], self.values['other_tag']
+        author = self.values['author']
+        return (
+            {'tags': [tag]},
+            {'tags': [tag, other_tag]},
+            {'tags': [tag, other_tag], 'tags_match': 'all'},
+            {'tags': [tag], 'author': author},
+            {'tags': [tag, other_tag], 'is_favorited': 1},
+            {'tags': [tag, other_tag], 'tags_match': 'all',
+             'is_in_shopping_cart': 1},
+            {'tags': [tag], 'author': author, 'is_favorited': 1,
+             'is_in_shopping_cart': 1},
+            {'author': author, 'is_favorited': 1},
+            {'is_in_shopping_cart': 1},
+        )
+
+    def get_url(self, params):
+        query = '&'.join(
+            f'{name}={value}'
+            for name, values in params.items()
+            for value in (values if isinstance(values, list) else [values])
+        )
+        return f'/api/recipes/?limit={self.recipes_count}&{query}'
+
+    def test_filters_return_matching_recipes_once(self):
+        for params in self.get_cases():
+            with self.subTest(**params):
+                results = self.get(self.get_url(params))['results']
+                ids = [item['id'] for item in results]
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(set(ids), self.get_expected_ids(params))
+
+    def test_filter_queries(self):
+        for params in self.get_cases():
+            with self.subTest(**params):
+                with CaptureQueriesContext(connection) as queries:
+                    self.get(self.get_url(params))
+                # Counting the page and loading it, the page is skipped
+                # when nothing matches.
+                self.assertLessEqual(len(queries), 2, [
+                    query['sql'] for query in queries.captured_queries
+                ])
+                allowed = set()
+                if set(params) <= set(self.allowed_full_scans):
+                    allowed = set.union(*(self.allowed_full_scans[name]
+                                          for name in params))
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    self.assertNotIn('DISTINCT', sql.upper())
+                    if has_plan(sql):
+                        self.assertLessEqual(
+                            set(get_full_scans(explain(sql))), allowed, sql
+                        )
+
+
+class RecipeSearchTest(RecipeAPITestCase):
+    '''
+    Search combines with the other filters without losing matches, and
+    ranks matches in names above matches in descriptions.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        recipes = list(Recipe.objects.order_by('id'))
+        for index, recipe in enumerate(recipes):
+            if index % 2:
+                recipe.name = f'Борщ {index}'
+                recipe.save()
+        self.text_match = recipes[0]
+        self.text_match.text = 'Подавать как борщ'
+        self.text_match.save()
+        self.matching_ids = set(
+            Recipe.objects.filter(
+                Q(name__contains='Борщ') | Q(text__contains='борщ')
+            ).values_list('id', flat=True)
+        )
+
+    def search(self, query=''):
+        data = self.get(
+            f'/api/recipes/?search=борщ&limit={self.recipes_count}{query}'
+        )
+        return [item['id'] for item in data['results']]
+
+    def test_search_combines_with_filters(self):
+        author = self.values['author']
+        favorites = set(FavoriteRecipe.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+        cases = (
+            ('', self.matching_ids),
+            (f'&author={author}', self.matching_ids & set(
+                Recipe.objects.filter(
+                    author_id=author
+                ).values_list('id', flat=True)
+            )),
+            ('&is_favorited=1', self.matching_ids & favorites),
+            (f'&tags={self.values["tag"]}', self.matching_ids & set(
+                RecipeTag.objects.filter(
+                    tag__slug=self.values['tag']
+                ).values_list('recipe_id', flat=True)
+            )),
+        )
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertTrue(expected)
+                ids = self.search(query)
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(set(ids), expected)
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search()[-1], self.text_match.id)
+
+    def test_cursor_is_rejected(self):
+        response = self.client.get('/api/recipes/?search=борщ&cursor=')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+
+class RecipeDocumentTest(RecipeAPITestCase):
+    '''
+    Recipes rendered from documents are the same as rendered by
+    RecipeSerializer, and concurrent writers of documents do not
+    conflict.
+    '''
+
+    def serialize(self, recipe_ids):
+        ''' Return live RecipeSerializer representations by ids. '''
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = self.user
+        recipes = with_relations(Recipe.objects.filter(id__in=recipe_ids))
+        data = RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        return {item['id']: json.loads(json.dumps(item)) for item in data}
+
+    def test_documents_match_serializer(self):
+        for built in ('on read', 'by rebuild'):
+            with self.subTest(built=built):
+                if built == 'by rebuild':
+                    self.assertEqual(rebuild_documents(), self.recipes_count)
+                data = self.get(f'/api/recipes/?limit={self.recipes_count}')
+                results = data['results']
+                expected = self.serialize(item['id'] for item in results)
+                self.assertEqual(len(results), self.recipes_count)
+                for item in results:
+                    self.assertEqual(item, expected[item['id']])
+                    self.assertNotIn('fanned_out', item)
+
+    def test_concurrent_writes_do_not_conflict(self):
+        recipe_ids = [self.values['recipe'], self.values['other_recipe']]
+        # Documents built on read by another request are kept.
+        documents = build_documents(recipe_ids)
+        for recipe_id, document in documents.items():
+            documents[recipe_id] = json.dumps(
+                dict(json.loads(document), name='Built concurrently')
+            )
+        insert_documents(documents)
+        insert_documents(build_documents(recipe_ids))
+        data = self.get(f'/api/recipes/{self.values["recipe"]}/')
+        self.assertEqual(data['name'], 'Built concurrently')
+        # Rebuilds replace stored documents.
+        for _ in range(2):
+            self.assertEqual(rebuild_documents(recipe_ids), len(recipe_ids))
+        self.assertEqual(
+            RecipeDocument.objects.filter(recipe_id__in=recipe_ids).count(),
+            len(recipe_ids)
+        )
+        self.assertEqual(
+            self.get(f'/api/recipes/{self.values["recipe"]}/'),
+            self.serialize(recipe_ids)[self.values['recipe']]
+        )
+
+
+@override_settings(FEED_BACKFILL_SIZE=2)
+class RecipeTimelineTest(RecipeAPITestCase):
+    '''
+    Recipes which are not fanned out are pulled into the timeline on
+    read, the first pull takes only latest recipes of every author.
+    '''
+
+    def get_latest_ids(self, count):
+        recipe_ids = set()
+        for author_id in UserSubscription.objects.filter(
+                subscriber=self.user).values_list('subscribed_id', flat=True):
+            recipe_ids.update(Recipe.objects.filter(
+                author_id=author_id
+            ).order_by('-created', '-id').values_list('id', flat=True)[:count])
+        return recipe_ids
+
+    def test_first_pull_is_bounded_per_author(self):
+        # Recipes of the dataset are not fanned out, as commit hooks do
+        # not run in tests.
+        data = self.get(f'/api/recipes/timeline/?limit={self.recipes_count}')
+        expected = self.get_latest_ids(2)
+        self.assertEqual({item['id'] for item in data['results']}, expected)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(),
+            len(expected)
+        )
+
+
+class RecipeImageUploadTest(RecipeAPITestCase):
+    '''
+    Uploaded images are spooled to disk and checked by their header, so
+    the peak of memory allocated by the request does not include the
+    decoded image.
+    '''
+    recipes_count = 4
+    side = 2000
+
+    def setUp(self):
+        super().setUp()
+        # Noise does not compress, so the file is a few megabytes.
+        image = Image.frombytes(
+            'RGB', (self.side, self.side), os.urandom(self.side ** 2 * 3)
+        )
+        file = io.BytesIO()
+        image.save(file, 'JPEG', quality=90)
+        self.image = file.getvalue()
+        self.decoded_size = self.side ** 2 * 3
+        self.view = RecipeViewSet.as_view({'post': 'create'})
+
+    def post(self, data, format):
+        ''' Create a recipe and return the response and peak memory. '''
+        request = APIRequestFactory().post('/api/recipes/', data,
+                                           format=format)
+        force_authenticate(request, self.user)
+        tracemalloc.start()
+        try:
+            response = self.view(request)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return response, peak
+
+    def get_json(self):
+        return {
+            'name': 'Base64 upload',
+            'text': 'Text',
+            'cooking_time': 10,
+            'image': 'data:image/jpeg;base64,' + base64.b64encode(
+                self.image
+            ).decode(),
+            'tags': self.values['tag_ids'],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 1}
+                for ingredient_id in self.values['ingredient_ids']
+            ],
+        }
+
+    def get_multipart(self):
+        image = io.BytesIO(self.image)
+        image.name = 'image.jpg'
+        data = {
+            'name': 'Multipart upload',
+            'text': 'Text',
+            'cooking_time': 10,
+            'image': image,
+        }
+        for index, tag_id in enumerate(self.values['tag_ids']):
+            data[f'tags[{index}]'] = tag_id
+        for index, ingredient_id in enumerate(self.values['ingredient_ids']):
+            data[f'ingredients[{index}]id'] = ingredient_id
+            data[f'ingredients[{index}]amount'] = 1
+        return data
+
+    def test_multipart_upload_is_spooled_to_disk(self):
+        response, peak = self.post(self.get_multipart(), 'multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertLess(peak, len(self.image) // 2)
+
+    def test_base64_upload_is_decoded_by_chunks(self):
+        data = self.get_json()
+        response, peak = self.post(data, 'json')
+        self.assertEqual(response.status_code, 201, response.data)
+        # The raw body and the parsed string are in memory, the decoded
+        # bytes and the image are not.
+        self.assertLess(peak, len(data['image']) * 2 + len(self.image) // 2)
+        self.assertLess(peak, self.decoded_size)
+
+    def test_limits_are_checked_before_decoding(self):
+        cases = (
+            ('too_large', {'IMAGE_UPLOAD_MAX_SIZE': len(self.image) - 1}),
+            ('too_many_pixels',
+             {'IMAGE_UPLOAD_MAX_PIXELS': self.side ** 2 - 1}),
+        )
+        for code, limits in cases:
+            for format, data in (('json', self.get_json()),
+                                 ('multipart', self.get_multipart())):
+                with self.subTest(code=code, format=format), \
+                        override_settings(**limits):
+                    response, peak = self.post(data, format)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.data['image'][0].code, code)
+                    self.assertLess(peak, self.decoded_size)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+}})
+class CatalogWithoutCacheTest(TestCase):
+    '''
+    Catalog endpoints work and are validated by the catalog version of
+    the process when the cache does not keep the shared version.
+    '''
+
+    def setUp(self):
+        Tag.objects.create(name='Breakfast', color='#E26C2D',
+                           slug='breakfast')
+        Ingredient.objects.create(name='Salt', measurement_unit='g')
+        self.client = APIClient()
+
+    def test_catalog_responses_are_conditional(self):
+        for url, model in (('/api/tags/', Tag),
+                           ('/api/ingredients/', Ingredient)):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()), 1)
+                etag = response['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                model.objects.update(name='Changed')
+                model.objects.get().save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()[0]['name'], 'Changed')
@@ -7,36 +7,46 @@ from rest_framework import (mixins, permissions, status, validators,
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from api.exports import get_shopping_cart_file
+from api.mixins import CatalogViewMixin
+from api.negotiation import IgnoreFormatContentNegotiation
 from api.permissions import AuthorOrAdminOrReadOnly
-from api.utils import get_shopping_cart_file
-from recipes.models import Ingredient, Recipe, Tag
-from .filters import IngredientFilter, RecipeFilter
-from .serializers import (IngredientSerializer, RecipeSerializer,
-                          RecipeShortSerializer, TagSerializer)
+from recipes.catalog import ingredient_catalog, tag_catalog
+from recipes.models import Ingredient, Recipe, Tag, TimelineEntry
+from recipes.relations import add_relations, remove_relations
+from recipes.timeline import pull_timeline
+from .documents import get_documents
+from .filters import ORDERINGS, IngredientFilter, RecipeFilter
+from .serializers import (BulkIdsSerializer, IngredientSerializer,
+                          RecipeSerializer, RecipeShortSerializer,
+                          TagSerializer)
 
 
-class TagViewSet(mixins.RetrieveModelMixin,
+class TagViewSet(CatalogViewMixin,
+                 mixins.RetrieveModelMixin,
                  mixins.ListModelMixin,
                  viewsets.GenericViewSet):
     ''' ViewSet for tag actions. '''
     http_method_names = ['get']
+    catalog = tag_catalog
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
 
 
-class IngredientViewSet(mixins.RetrieveModelMixin,
+class IngredientViewSet(CatalogViewMixin,
+                        mixins.RetrieveModelMixin,
                         mixins.ListModelMixin,
                         viewsets.GenericViewSet):
     ''' ViewSet for ingredient actions. '''
     http_method_names = ['get']
+    catalog = ingredient_catalog
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
     filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -47,41 +57,131 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
-    def _set_recipe_to_related(self, related_manager):
+    @property
+    def cursor_ordering(self):
+        ''' Return ordering of keyset pagination for 'ordering' filter. '''
+        if self.action == 'timeline':
+            return ('-created', '-recipe_id')
+        return ORDERINGS.get(
+            self.request.query_params.get('ordering'), ('-created', '-id')
+        )
+
+    def get_queryset(self):
+        '''
+        Plan the queryset for reading: recipes are rendered from their
+        precomputed documents loaded with the same query, user flags are
+        read from the relations cache.
+        '''
+        if self.action not in ('list', 'retrieve'):
+            return super().get_queryset()
+        return self.queryset.select_related('document')
+
+    def list(self, request, *args, **kwargs):
+        # Keyset pagination orders by its fields and would lose the rank.
+        if ('search' in request.query_params
+                and self.paginator.cursor_query_param in request.query_params):
+            raise validators.ValidationError({
+                self.paginator.cursor_query_param: [
+                    _('Search results can not be paginated by cursor, '
+                      'use page numbers.')
+                ]
+            })
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(get_documents(page, request))
+        return Response(get_documents(queryset, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(get_documents([self.get_object()], request)[0])
+
+    def _set_recipe_to_related(self, relation):
         ''' Process common recipe actions. '''
         recipe = self.get_object()
+        user_id = self.request.user.id
         if self.request.method == 'DELETE':
-            related_manager.get(recipe_id=recipe.id).delete()
+            remove_relations(user_id, relation, [recipe.id])
             return Response(status=status.HTTP_204_NO_CONTENT)
-        if related_manager.filter(recipe=recipe).exists():
+        if not add_relations(user_id, relation, [recipe.id]):
             raise validators.ValidationError(
                 _('The recipe already exists.')
             )
-        related_manager.create(recipe=recipe)
         serializer = RecipeShortSerializer(instance=recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def _set_recipes_to_related(self, relation):
+        '''
+        Process common bulk recipe actions in one transaction: POST adds
+        and DELETE removes recipes by ids, missing ids are skipped.
+        '''
+        serializer = BulkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        change = (remove_relations if self.request.method == 'DELETE'
+                  else add_relations)
+        return Response({'ids': sorted(
+            change(self.request.user.id, relation, ids)
+        )})
+
     @action(detail=True, methods=['get', 'delete'],
             permission_classes=(permissions.IsAuthenticated,),
             name='favorite')
     def favorite(self, request, pk=None):
         ''' Process user favorite recipe actions. '''
-        return self._set_recipe_to_related(
-            request.user.favorite_recipes
-        )
+        return self._set_recipe_to_related('favorite_recipes')
 
     @action(detail=True, methods=['get', 'delete'],
             permission_classes=(permissions.IsAuthenticated,),
             name='shopping_cart')
     def shopping_cart(self, request, pk=None):
         ''' Process user shopping cart actions. '''
-        return self._set_recipe_to_related(
-            request.user.shopping_cart
-        )
+        return self._set_recipe_to_related('shopping_cart')
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,),
+            name='bulk_favorite')
+    def bulk_favorite(self, request):
+        ''' Add or remove many recipes to user favorites. '''
+        return self._set_recipes_to_related('favorite_recipes')
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,),
+            name='bulk_shopping_cart')
+    def bulk_shopping_cart(self, request):
+        ''' Add or remove many recipes to user shopping cart. '''
+        return self._set_recipes_to_related('shopping_cart')
 
     @action(detail=False, methods=['get'],
             permission_classes=(permissions.IsAuthenticated,),
+            name='timeline')
+    def timeline(self, request):
+        '''
+        Get recipes of followed authors, newest first, from the timeline
+        of the user. A page is read with a single range scan of the
+        timeline index, after recipes which are not fanned out are pulled.
+        '''
+        pull_timeline(request.user.id)
+        entries = TimelineEntry.objects.filter(
+            user=request.user
+        ).select_related('recipe__document').order_by('-created', '-recipe_id')
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            return self.get_paginated_response(get_documents(
+                [entry.recipe for entry in page], request
+            ))
+        return Response(get_documents(
+            [entry.recipe for entry in entries], request
+        ))
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(permissions.IsAuthenticated,),
+            content_negotiation_class=IgnoreFormatContentNegotiation,
             name='download_shopping_cart')
     def download_shopping_cart(self, request, pk=None):
-        ''' Get a file with a list of ingredients from shopping cart. '''
-        return get_shopping_cart_file(request.user)
+        '''
+        Get a file with a list of ingredients from shopping cart,
+        in format from 'format' query parameter: txt, csv or pdf.
+        '''
+        return get_shopping_cart_file(
+            request.user, request.query_params.get('format', 'txt')
+        )
@@ -0,0 +1,116 @@
+''' Tests for API authentication, permissions and exports. '''
+
+import re
+import tempfile
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import _get_key, _local_cache
+from api.exports import PDFExporter
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    '''
+    Tokens are cached in the default cache only when it is shared by
+    processes, so a revoked token is not accepted by other processes
+    for longer than the local timeout.
+    '''
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='First', last_name='Last', password='Password-2021'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.key = _get_key(self.token.key)
+        _local_cache.delete(self.key)
+
+    def test_local_cache_is_not_used_as_shared_tier(self):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(_local_cache.get(self.key))
+        self.assertIsNone(cache.get(self.key))
+
+    def test_shared_cache_is_used(self):
+        with tempfile.TemporaryDirectory() as location, \
+                override_settings(CACHES={'default': {
+                    'BACKEND': (
+                        'django.core.cache.backends.filebased.FileBasedCache'
+                    ),
+                    'LOCATION': location,
+                }}):
+            response = self.client.get('/api/users/me/')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNotNone(cache.get(self.key))
+
+
+class MetricsPermissionTest(TestCase):
+    ''' Request metrics are available only to staff users. '''
+
+    def test_metrics_require_staff_user(self):
+        user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='First', last_name='Last', password='Password-2021'
+        )
+        client = APIClient()
+        self.assertEqual(client.get('/api/metrics').status_code, 401)
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/metrics').status_code, 403)
+        user.is_staff = True
+        response = client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+
+class PDFExporterTest(SimpleTestCase):
+    ''' PDF pages are text in an embedded font subset, not images. '''
+
+    def setUp(self):
+        self.rows = [('Ёжевика {}'.format(index), 'г', index)
+                     for index in range(100)]
+        self.data = b''.join(PDFExporter(iter(self.rows)))
+
+    def get_streams(self):
+        return [
+            zlib.decompress(stream) for stream in re.findall(
+                rb'stream\n(.*?)\nendstream', self.data, re.DOTALL
+            )
+        ]
+
+    def test_pages_are_text(self):
+        self.assertNotIn(b'/Image', self.data)
+        self.assertEqual(self.data.count(b'/Type /Page '), 3)
+        encoded = PDFExporter(iter(())).encode('Ёжевика 99 99г')
+        self.assertTrue(any(
+            b'<%s> Tj' % encoded in stream for stream in self.get_streams()
+        ))
+
+    def test_text_is_extractable(self):
+        to_unicode = self.get_streams()[-1]
+        mapped = set(
+            bytes.fromhex(code.decode()).decode('utf-16-be')
+            for code in re.findall(rb'<[0-9A-F]{4}> <([0-9a-f]+)>',
+                                   to_unicode)
+        )
+        self.assertEqual(mapped, set('Ёжевика 0123456789г'))
+
+    def test_cross_reference_offsets(self):
+        xref = self.data.rindex(b'\nxref\n') + 1
+        self.assertEqual(
+            int(re.search(rb'startxref\n(\d+)', self.data).group(1)), xref
+        )
+        offsets = re.findall(rb'(\d{10}) 00000 n', self.data[xref:])
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(
+                self.data[int(offset):].startswith(b'%d 0 obj' % number)
+            )
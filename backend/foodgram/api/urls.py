@@ -2,9 +2,12 @@
 
 from django.urls import include, path
 
+from core.views import metrics
+
 urlpatterns = [
     path('', include('api.recipes.urls')),
     path('', include('api.users.urls')),
     path('', include('djoser.urls')),
-    path('auth/', include('djoser.urls.authtoken'))
+    path('auth/', include('djoser.urls.authtoken')),
+    path('metrics', metrics, name='metrics'),
 ]
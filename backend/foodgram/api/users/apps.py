@@ -8,3 +8,6 @@ class UsersConfig(AppConfig):
     Encapsulate config options for 'users' API application.
     '''
     name = label = 'api.users'
+
+    def ready(self):
+        from api import authentication  # noqa: F401
@@ -10,7 +10,8 @@ User = get_user_model()
 
 class UserSerializer(
         serializers.ModelSerializer,
-        mixins.SerializerMethodFieldMixin):
+        mixins.SerializerMethodFieldMixin,
+        mixins.TimedSerializerMixin):
     ''' Serializer for :model:'users.User'. '''
     is_subscribed = serializers.SerializerMethodField()
 
@@ -24,6 +25,7 @@ class UserSerializer(
             'last_name',
             'is_subscribed',
         )
+        list_serializer_class = mixins.TimedListSerializer
 
     def get_is_subscribed(self, obj):
-        return self.get_exists('subscriptions', id=obj.id)
+        return self.get_exists('subscriptions', obj.id)
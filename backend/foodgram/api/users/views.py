@@ -1,21 +1,46 @@
 ''' Views for 'users' API application. '''
 
 from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from rest_framework import status, validators, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from api.recipes.serializers import UserSubscriptionSerializer
+from api.recipes.serializers import (BulkIdsSerializer,
+                                     UserSubscriptionSerializer)
+from api.utils import get_recipes_limit
+from recipes.models import Recipe
+from recipes.relations import add_relations, remove_relations
 
 
 class SubscriptionsViewSet(viewsets.GenericViewSet):
     ''' ViewSet for user subscription actions. '''
     serializer_class = UserSubscriptionSerializer
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
-        return self.request.user.subscriptions.all()
+        '''
+        Annotate the recipes count and prefetch only the latest
+        'recipes_limit' recipes of every author in a single query.
+        '''
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit == 0:
+            recipes = recipes.none()
+        elif recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(author=OuterRef('author'))
+                              .values('id')[:recipes_limit]
+            ))
+        return (
+            self.request.user.subscriptions
+                .annotate(recipes_count=Count('recipes'))
+                .prefetch_related(Prefetch(
+                    'recipes', queryset=recipes, to_attr='limited_recipes'
+                ))
+        )
 
     @action(detail=False, methods=['get'], name='subscriptions')
     def subscriptions(self, request, pk=None):
@@ -32,12 +57,31 @@ class SubscriptionsViewSet(viewsets.GenericViewSet):
         ''' Process user subscription actions.. '''
         subscribed = get_object_or_404(get_user_model(), id=pk)
         if self.request.method == 'DELETE':
-            request.user.subscriptions.remove(subscribed)
+            remove_relations(request.user.id, 'subscriptions', [subscribed.id])
             return Response(status=status.HTTP_204_NO_CONTENT)
-        if request.user.subscriptions.filter(id=subscribed.id).exists():
+        if subscribed.id == request.user.id:
+            raise validators.ValidationError(
+                _('You can not subscribe to yourself.')
+            )
+        if not add_relations(request.user.id, 'subscriptions',
+                             [subscribed.id]):
             raise validators.ValidationError(
                 _('The subscription already exists.')
             )
-        request.user.subscriptions.add(subscribed)
         serializer = self.get_serializer(instance=subscribed)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post', 'delete'], name='bulk_subscribe')
+    def bulk_subscribe(self, request):
+        '''
+        Subscribe to or unsubscribe from many users by ids in one
+        transaction, missing ids and the user itself are skipped.
+        '''
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = (remove_relations if request.method == 'DELETE'
+                  else add_relations)
+        return Response({'ids': sorted(change(
+            request.user.id, 'subscriptions',
+            serializer.validated_data['ids']
+        ))})
@@ -1,23 +1,22 @@
 ''' Utils for API. '''
 
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.validators import ValidationError
 
 
-def get_shopping_cart_file(user):
-    data = (
-        user.shopping_cart
-            .values_list(
-                'recipe__ingredients__ingredient__name',
-                'recipe__ingredients__ingredient__measurement_unit',
-            ).annotate(summary=Sum('recipe__ingredients__amount'))
-    )
-    items = (
-        ['{} {}{}'.format(item[0], item[2], item[1]) for item in data]
-    )
-    response = HttpResponse(
-        '\n'.join(items), content_type='text/plain; charset=utf-8'
-    )
-    response['Content-Disposition'] = ('attachment;'
-                                       ' filename="shopping_cart.txt"')
-    return response
+def get_recipes_limit(request):
+    ''' Get the value of 'recipes_limit' query parameter. '''
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError(
+            _('''Parameter 'recipes_limit' excepted a int type''')
+        )
+    if recipes_limit < 0:
+        raise ValidationError(
+            _('''Parameter 'recipes_limit' must not be negative''')
+        )
+    return recipes_limit
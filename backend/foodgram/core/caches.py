@@ -0,0 +1,16 @@
+''' Checks of cache backends. '''
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Backends which keep entries in memory of a process or do not keep them.
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_cache_shared(alias=DEFAULT_CACHE_ALIAS):
+    '''
+    Return True if entries of the cache are seen by all processes
+    of the server.
+    '''
+    return not isinstance(caches[alias], LOCAL_BACKENDS)
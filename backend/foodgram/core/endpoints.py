@@ -0,0 +1,244 @@
+''' Requests to API endpoints for checks against a seeded dataset. '''
+
+import base64
+import io
+import re
+from collections import namedtuple
+
+from django.core.management.base import CommandError
+from PIL import Image
+
+PASSWORD = 'Benchmark-Password-2021'
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+# Setup and teardown are (method, url, data) requests sent around the
+# endpoint request. The id of an object created by setup is available
+# to the endpoint URL as {created}.
+Endpoint = namedtuple(
+    'Endpoint', 'name method url budget data setup teardown',
+    defaults=(None, None, None, None)
+)
+RECIPE = {
+    'name': 'Benchmark {n}',
+    'text': 'Text',
+    'cooking_time': 10,
+    'image': '{image}',
+    'tags': '{tag_ids}',
+    'ingredients': '{ingredients}',
+}
+RECIPE_UPDATE = {key: value for key, value in RECIPE.items()
+                 if key != 'image'}
+USER = {
+    'email': '{prefix}-new-{n}@example.com',
+    'username': '{prefix}-new-{n}',
+    'first_name': 'First',
+    'last_name': 'Last',
+    'password': '{password}',
+}
+
+# Requests checked by explain_endpoints and benchmark_endpoints with
+# their query budgets. Endpoints named '-anonymous' are requested
+# without authentication.
+ENDPOINTS = (
+    Endpoint('recipes-list', 'get', '/api/recipes/', 2),
+    Endpoint('recipes-list-anonymous', 'get', '/api/recipes/', 2),
+    Endpoint('recipes-list-filtered', 'get',
+             '/api/recipes/?tags={tag}&tags={other_tag}&author={author}'
+             '&is_favorited=1&is_in_shopping_cart=1', 2),
+    Endpoint('recipes-list-tags-any', 'get',
+             '/api/recipes/?tags={tag}&tags={other_tag}', 2),
+    Endpoint('recipes-list-tags-all', 'get',
+             '/api/recipes/?tags={tag}&tags={other_tag}&tags_match=all', 2),
+    Endpoint('recipes-list-tags-author', 'get',
+             '/api/recipes/?tags={tag}&author={author}', 2),
+    Endpoint('recipes-list-tags-favorited', 'get',
+             '/api/recipes/?tags={tag}&tags={other_tag}&is_favorited=1', 2),
+    Endpoint('recipes-list-tags-in-cart', 'get',
+             '/api/recipes/?tags={tag}&tags={other_tag}&tags_match=all'
+             '&is_in_shopping_cart=1', 2),
+    Endpoint('recipes-list-cursor', 'get', '/api/recipes/?cursor=', 1),
+    Endpoint('recipes-list-cursor-deep', 'get',
+             '/api/recipes/?cursor={cursor}', 1),
+    Endpoint('recipes-list-popular', 'get',
+             '/api/recipes/?ordering=popular', 2),
+    Endpoint('recipes-list-popular-cursor', 'get',
+             '/api/recipes/?ordering=popular&cursor=', 1),
+    Endpoint('recipes-list-popular-cursor-deep', 'get',
+             '/api/recipes/?ordering=popular&cursor={popular_cursor}', 1),
+    Endpoint('recipes-search', 'get',
+             '/api/recipes/?search={recipe_name}', 2),
+    Endpoint('recipes-detail', 'get', '/api/recipes/{recipe}/', 1),
+    Endpoint('recipes-create', 'post', '/api/recipes/', 14, RECIPE),
+    Endpoint('recipes-update', 'patch', '/api/recipes/{own_recipe}/', 16,
+             RECIPE_UPDATE),
+    Endpoint('recipes-delete', 'delete', '/api/recipes/{created}/', 10,
+             setup=('post', '/api/recipes/', RECIPE)),
+    Endpoint('recipes-favorite-add', 'get',
+             '/api/recipes/{other_recipe}/favorite/', 3,
+             teardown=('delete', '/api/recipes/{other_recipe}/favorite/',
+                       None)),
+    Endpoint('recipes-favorite-remove', 'delete',
+             '/api/recipes/{other_recipe}/favorite/', 3,
+             setup=('get', '/api/recipes/{other_recipe}/favorite/', None)),
+    Endpoint('recipes-shopping-cart-add', 'get',
+             '/api/recipes/{other_recipe}/shopping_cart/', 3,
+             teardown=('delete', '/api/recipes/{other_recipe}/shopping_cart/',
+                       None)),
+    Endpoint('recipes-shopping-cart-remove', 'delete',
+             '/api/recipes/{other_recipe}/shopping_cart/', 3,
+             setup=('get', '/api/recipes/{other_recipe}/shopping_cart/',
+                    None)),
+    Endpoint('recipes-bulk-favorite-add', 'post',
+             '/api/recipes/bulk_favorite/', 2, {'ids': '{recipe_ids}'},
+             teardown=('delete', '/api/recipes/bulk_favorite/',
+                       {'ids': '{recipe_ids}'})),
+    Endpoint('recipes-bulk-favorite-remove', 'delete',
+             '/api/recipes/bulk_favorite/', 2, {'ids': '{recipe_ids}'},
+             setup=('post', '/api/recipes/bulk_favorite/',
+                    {'ids': '{recipe_ids}'})),
+    Endpoint('recipes-bulk-shopping-cart-add', 'post',
+             '/api/recipes/bulk_shopping_cart/', 2,
+             {'ids': '{recipe_ids}'},
+             teardown=('delete', '/api/recipes/bulk_shopping_cart/',
+                       {'ids': '{recipe_ids}'})),
+    Endpoint('recipes-bulk-shopping-cart-remove', 'delete',
+             '/api/recipes/bulk_shopping_cart/', 2, {'ids': '{recipe_ids}'},
+             setup=('post', '/api/recipes/bulk_shopping_cart/',
+                    {'ids': '{recipe_ids}'})),
+    Endpoint('recipes-download-shopping-cart-txt', 'get',
+             '/api/recipes/download_shopping_cart/?format=txt', 1),
+    Endpoint('recipes-download-shopping-cart-csv', 'get',
+             '/api/recipes/download_shopping_cart/?format=csv', 1),
+    Endpoint('recipes-download-shopping-cart-pdf', 'get',
+             '/api/recipes/download_shopping_cart/?format=pdf', 1),
+    Endpoint('recipes-timeline', 'get', '/api/recipes/timeline/?cursor=', 2),
+    Endpoint('tags-list', 'get', '/api/tags/', 0),
+    Endpoint('tags-detail', 'get', '/api/tags/{tag_id}/', 1),
+    Endpoint('ingredients-list', 'get', '/api/ingredients/', 0),
+    Endpoint('ingredients-search', 'get',
+             '/api/ingredients/?name={ingredient}', 0),
+    Endpoint('ingredients-detail', 'get',
+             '/api/ingredients/{ingredient_id}/', 1),
+    Endpoint('users-subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', 3),
+    Endpoint('users-subscriptions-cursor-deep', 'get',
+             '/api/users/subscriptions/?recipes_limit=3'
+             '&cursor={subscriptions_cursor}', 3),
+    Endpoint('users-subscribe', 'get',
+             '/api/users/{other_author}/subscribe/', 5,
+             teardown=('delete', '/api/users/{other_author}/subscribe/',
+                       None)),
+    Endpoint('users-unsubscribe', 'delete',
+             '/api/users/{other_author}/subscribe/', 3,
+             setup=('get', '/api/users/{other_author}/subscribe/', None)),
+    Endpoint('users-bulk-subscribe', 'post', '/api/users/bulk_subscribe/', 2,
+             {'ids': '{author_ids}'},
+             teardown=('delete', '/api/users/bulk_subscribe/',
+                       {'ids': '{author_ids}'})),
+    Endpoint('users-bulk-unsubscribe', 'delete',
+             '/api/users/bulk_subscribe/', 2, {'ids': '{author_ids}'},
+             setup=('post', '/api/users/bulk_subscribe/',
+                    {'ids': '{author_ids}'})),
+    Endpoint('users-list', 'get', '/api/users/', 2),
+    Endpoint('users-create', 'post', '/api/users/', 5, USER),
+    Endpoint('users-detail', 'get', '/api/users/{author}/', 1),
+    Endpoint('users-me', 'get', '/api/users/me/', 0),
+    Endpoint('users-set-password', 'post', '/api/users/set_password/', 3, {
+        'new_password': '{password}',
+        'current_password': '{password}',
+    }),
+    Endpoint('token-login', 'post', '/api/auth/token/login/', 4,
+             {'email': '{email}', 'password': '{password}'}),
+    Endpoint('token-logout', 'post', '/api/auth/token/logout/', 1),
+)
+
+
+def get_endpoints(names=None):
+    ''' Return endpoints with the given names, all endpoints by default. '''
+    if not names:
+        return ENDPOINTS
+    unknown = set(names) - {endpoint.name for endpoint in ENDPOINTS}
+    if unknown:
+        raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}.')
+    return [endpoint for endpoint in ENDPOINTS if endpoint.name in names]
+
+
+def fill(template, values):
+    '''
+    Return template with placeholders replaced by values. A string
+    which is a single placeholder is replaced by the value itself.
+    '''
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(item, values) for item in template]
+    if isinstance(template, str):
+        match = PLACEHOLDER.fullmatch(template)
+        if match:
+            return values[match.group(1)]
+        return template.format(**values)
+    return template
+
+
+def get_image():
+    file = io.BytesIO()
+    Image.new('RGB', (8, 8), 'white').save(file, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        file.getvalue()
+    ).decode()
+
+
+def prepare_values(user, values):
+    '''
+    Set the known password to the seeded user and add values for
+    request bodies to the seeded values.
+    '''
+    user.set_password(PASSWORD)
+    user.save()
+    values.update(
+        email=user.email,
+        password=PASSWORD,
+        image=get_image(),
+        ingredients=[
+            {'id': ingredient_id, 'amount': 1}
+            for ingredient_id in values['ingredient_ids']
+        ],
+    )
+    return values
+
+
+def call(client, request, values):
+    ''' Send the (method, url, data) request and return the response. '''
+    method, url, data = request
+    url = fill(url, values)
+    if data is None:
+        response = getattr(client, method)(url)
+    else:
+        response = getattr(client, method)(
+            url, fill(data, values), format='json'
+        )
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code >= 400:
+        raise CommandError(
+            f'{method.upper()} {url} failed: {response.status_code} '
+            f'{response.content[:200]!r}'
+        )
+    return response
+
+
+def run(client, endpoint, values, measure):
+    '''
+    Send the endpoint request between its setup and teardown requests
+    and return the result of measure for it. Measure is called with
+    a function sending the request.
+    '''
+    values = dict(values)
+    if endpoint.setup:
+        response = call(client, endpoint.setup, values)
+        values['created'] = response.data.get('id')
+    request = (endpoint.method, endpoint.url, endpoint.data)
+    result = measure(lambda: call(client, request, values))
+    if endpoint.teardown:
+        call(client, endpoint.teardown, values)
+    return result
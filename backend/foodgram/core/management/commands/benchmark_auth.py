@@ -0,0 +1,87 @@
+''' Command to measure the overhead of token authentication. '''
+
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, invalidate_token
+from .explain_endpoints import Rollback
+
+User = get_user_model()
+
+AUTHENTICATION_CLASSES = (TokenAuthentication, CachedTokenAuthentication)
+
+
+class Command(BaseCommand):
+    help = (
+        'Authenticate a request with a seeded token many times with every '
+        'authentication class and report time and queries per request. '
+        'The seeded data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Number of authenticated requests per class.'
+        )
+
+    def measure(self, authentication, request, count):
+        '''
+        Return seconds and number of queries per authentication
+        of the request.
+        '''
+        authentication.authenticate(request)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                authentication.authenticate(request)
+            elapsed = time.perf_counter() - started
+        return elapsed / count, len(queries) / count
+
+    def collect(self, count):
+        prefix = uuid.uuid4().hex[:8]
+        user = User.objects.create(
+            email=f'{prefix}@example.com', username=prefix,
+            first_name='First', last_name='Last',
+            password=make_password(None),
+        )
+        token = Token.objects.create(user=user)
+        request = APIRequestFactory().get(
+            '/api/users/me/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        results = {
+            authentication_class.__name__: self.measure(
+                authentication_class(), request, count
+            )
+            for authentication_class in AUTHENTICATION_CLASSES
+        }
+        return token.key, results
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('Number of requests must be positive.')
+        results = None
+        # A private cache keeps the seeded token out of the shared one.
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark-auth',
+        }}):
+            try:
+                with transaction.atomic():
+                    key, results = self.collect(options['requests'])
+                    raise Rollback
+            except Rollback:
+                invalidate_token(key)
+        for name, (seconds, queries) in results.items():
+            self.stdout.write(
+                f'{name:<28} {seconds * 1000000:>9.1f} us/request '
+                f'queries: {queries:g}/request'
+            )
@@ -0,0 +1,192 @@
+''' Command to benchmark API endpoints with query budgets. '''
+
+import itertools
+import json
+import math
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from core.endpoints import get_endpoints, prepare_values, run
+from core.seeding import (MIN_INGREDIENTS, MIN_TAGS, MIN_USERS,
+                          seed_dataset)
+from .explain_endpoints import Rollback
+
+
+def get_percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every API endpoint against a seeded database and report '
+        'latency, allocations and query counts. Fails when an endpoint '
+        'exceeds its query budget. The seeded data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=200,
+            help='Number of seeded recipes.'
+        )
+        parser.add_argument(
+            '--users', type=int,
+            help='Number of seeded users, a tenth of recipes by default.'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=MIN_TAGS,
+            help='Number of seeded tags.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=20,
+            help='Number of seeded ingredients.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of timed requests per endpoint.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Name of endpoint to run, all endpoints by default.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Path of JSON file to save the results to.'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Path of JSON file with results to compare with.'
+        )
+
+    def run(self, client, endpoint, values, measure):
+        return run(client, endpoint, dict(values, n=next(self.counter)),
+                   measure)
+
+    def count_queries(self, send):
+        with CaptureQueriesContext(connection) as queries:
+            send()
+        return len(queries)
+
+    def trace_allocations(self, send):
+        tracemalloc.start()
+        try:
+            send()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def time_request(self, send):
+        started = time.perf_counter()
+        send()
+        return time.perf_counter() - started
+
+    def collect(self, options, endpoints):
+        user, values = seed_dataset(
+            options['recipes'], options['users'], options['tags'],
+            options['ingredients']
+        )
+        prepare_values(user, values)
+        client = APIClient()
+        client.force_authenticate(user)
+        anonymous = APIClient()
+        results = {}
+        for endpoint in endpoints:
+            endpoint_client = (anonymous if endpoint.name.endswith(
+                '-anonymous') else client)
+            self.run(endpoint_client, endpoint, values, lambda send: send())
+            queries = self.run(
+                endpoint_client, endpoint, values, self.count_queries
+            )
+            allocated = self.run(
+                endpoint_client, endpoint, values, self.trace_allocations
+            )
+            durations = [
+                self.run(endpoint_client, endpoint, values,
+                         self.time_request)
+                for _ in range(options['repeat'])
+            ]
+            results[endpoint.name] = {
+                'queries': queries,
+                'budget': endpoint.budget,
+                'median_ms': round(statistics.median(durations) * 1000, 3),
+                'p95_ms': round(get_percentile(durations, 95) * 1000, 3),
+                'allocated_kib': round(allocated / 1024, 1),
+            }
+        return results
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('Number of repeats must be positive.')
+        if (options['tags'] < MIN_TAGS
+                or options['ingredients'] < MIN_INGREDIENTS
+                or (options['users'] or MIN_USERS) < MIN_USERS
+                or options['recipes'] < 3):
+            raise CommandError(
+                f'At least {MIN_USERS} users, {MIN_TAGS} tags, '
+                f'{MIN_INGREDIENTS} ingredients and 3 recipes are required.'
+            )
+        endpoints = get_endpoints(options['endpoints'])
+        self.counter = itertools.count()
+        results = None
+        # A private cache keeps the seeded rows out of the shared one,
+        # a temporary media root keeps uploaded images.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark-endpoints',
+            }},
+            MEDIA_ROOT=media_root,
+        ):
+            try:
+                with transaction.atomic():
+                    results = self.collect(options, endpoints)
+                    raise Rollback
+            except Rollback:
+                pass
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['results']
+        for name, result in results.items():
+            line = (
+                f'{name:<36} queries: {result["queries"]:>2}'
+                f'/{result["budget"]:<3} '
+                f'median: {result["median_ms"]:>8.2f} ms '
+                f'p95: {result["p95_ms"]:>8.2f} ms '
+                f'allocated: {result["allocated_kib"]:>8.1f} KiB'
+            )
+            if name in previous:
+                before = previous[name]['median_ms']
+                change = (result['median_ms'] - before) / before * 100
+                line += f' median change: {change:+.1f}%'
+            self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'vendor': connection.vendor,
+                    'dataset': {
+                        key: options[key] for key in
+                        ('recipes', 'users', 'tags', 'ingredients')
+                    },
+                    'repeat': options['repeat'],
+                    'results': results,
+                }, file, indent=4, sort_keys=True)
+                file.write('\n')
+        exceeded = [
+            f'{name}: {result["queries"]} queries, '
+            f'budget {result["budget"]}'
+            for name, result in results.items()
+            if result['queries'] > result['budget']
+        ]
+        if exceeded:
+            raise CommandError(
+                'Query budgets exceeded:\n' + '\n'.join(exceeded)
+            )
+        self.stdout.write(self.style.SUCCESS('All budgets met.'))
@@ -0,0 +1,123 @@
+''' Command to benchmark the shopping cart export. '''
+
+import time
+import tracemalloc
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.exports import EXPORTERS
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            RecipeShoppingCart)
+from .explain_endpoints import Rollback
+
+User = get_user_model()
+
+INGREDIENTS_PER_RECIPE = 3
+
+
+class Command(BaseCommand):
+    help = (
+        'Export shopping carts of seeded sizes in every format and report '
+        'time, peak of traced allocations and size of the file. Recipes '
+        'have distinct ingredients, so the file grows with the cart. '
+        'The seeded data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 1000, 50000],
+            help='Numbers of recipes in the shopping cart.'
+        )
+        parser.add_argument(
+            '--format', action='append', dest='formats',
+            choices=sorted(EXPORTERS),
+            help='File format to export, all formats by default.'
+        )
+
+    def seed(self, size):
+        ''' Create a user with size recipes in the shopping cart. '''
+        prefix = uuid.uuid4().hex[:8]
+        user = User.objects.create(
+            email=f'{prefix}@example.com', username=prefix,
+            first_name='First', last_name='Last',
+            password=make_password(None)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'{prefix}-{index}', measurement_unit='g')
+            for index in range(size * INGREDIENTS_PER_RECIPE)
+        )
+        if not ingredients[0].pk:
+            ingredients = list(Ingredient.objects.filter(
+                name__startswith=prefix
+            ).order_by('id'))
+        Recipe.objects.bulk_create(
+            Recipe(author=user, name=f'{prefix}-{index}', text='Text',
+                   cooking_time=10, image='recipes/seed.png')
+            for index in range(size)
+        )
+        recipes = list(Recipe.objects.filter(author=user).order_by('id'))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for index, recipe in enumerate(recipes)
+            for ingredient in ingredients[
+                index * INGREDIENTS_PER_RECIPE:
+                (index + 1) * INGREDIENTS_PER_RECIPE
+            ]
+        )
+        RecipeShoppingCart.objects.bulk_create(
+            RecipeShoppingCart(user=user, recipe=recipe)
+            for recipe in recipes
+        )
+        return user
+
+    def export(self, client, file_format):
+        ''' Download the file and return its size. '''
+        response = client.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}'
+        )
+        if response.status_code != 200:
+            raise CommandError(
+                f'Export to {file_format} failed: {response.status_code} '
+                f'{response.content[:200]!r}'
+            )
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    def measure(self, client, file_format):
+        started = time.perf_counter()
+        size = self.export(client, file_format)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        try:
+            self.export(client, file_format)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return elapsed, peak, size
+
+    def handle(self, *args, **options):
+        if min(options['sizes']) < 1:
+            raise CommandError('Sizes must be positive.')
+        formats = options['formats'] or sorted(EXPORTERS)
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    client = APIClient()
+                    client.force_authenticate(self.seed(size))
+                    for file_format in formats:
+                        elapsed, peak, length = self.measure(
+                            client, file_format
+                        )
+                        self.stdout.write(
+                            f'{size:>6} recipes {file_format:<4} '
+                            f'time: {elapsed * 1000:>10.1f} ms '
+                            f'peak: {peak / 1024:>8.1f} KiB '
+                            f'size: {length / 1024:>9.1f} KiB'
+                        )
+                    raise Rollback
+            except Rollback:
+                pass
@@ -0,0 +1,110 @@
+''' Command to compare throughput of gunicorn worker classes. '''
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_endpoints import get_percentile
+from .time_first_request import (get, get_free_port, start_server,
+                                 wait_first_request)
+
+WORKER_CLASSES = ('sync', 'gthread')
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn with every worker class and the same number of '
+        'workers, send concurrent requests to it and report requests per '
+        'second and latency percentiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='/api/recipes/',
+            help='Path requested from the started server.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help=(
+                'Number of workers of every worker class. A single worker '
+                'is started without a shared cache.'
+            )
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Number of threads of gthread workers.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=16,
+            help='Number of concurrent clients.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Number of timed requests per worker class.'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait for the server to start.'
+        )
+
+    def time_request(self, url):
+        started = time.perf_counter()
+        status = get(url)
+        return status, time.perf_counter() - started
+
+    def load(self, url, options):
+        '''
+        Send requests by concurrent clients and return elapsed seconds
+        and latencies of the requests.
+        '''
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            # Every client opens a connection once before timing.
+            list(executor.map(self.time_request,
+                              [url] * options['concurrency']))
+            started = time.perf_counter()
+            results = list(executor.map(self.time_request,
+                                        [url] * options['requests']))
+            elapsed = time.perf_counter() - started
+        errors = [status for status, _ in results if status >= 500]
+        if errors:
+            raise CommandError(
+                f'{len(errors)} requests failed with status {errors[0]}.'
+            )
+        return elapsed, [latency for _, latency in results]
+
+    def measure(self, worker_class, options):
+        port = get_free_port()
+        url = f'http://127.0.0.1:{port}{options["path"]}'
+        # Sync workers are replaced by gthread ones with several threads.
+        threads = options['threads'] if worker_class == 'gthread' else 1
+        server = start_server(port, (
+            '--worker-class', worker_class,
+            '--workers', str(options['workers']),
+            '--threads', str(threads),
+        ))
+        try:
+            wait_first_request(
+                server, url, time.perf_counter(), options['timeout']
+            )
+            return self.load(url, options)
+        finally:
+            server.terminate()
+            server.wait()
+
+    def handle(self, *args, **options):
+        if min(options['workers'], options['threads'],
+               options['concurrency'], options['requests']) < 1:
+            raise CommandError(
+                'Numbers of workers, threads, clients and requests must be '
+                'positive.'
+            )
+        for worker_class in WORKER_CLASSES:
+            elapsed, latencies = self.measure(worker_class, options)
+            self.stdout.write(
+                f'{worker_class:<8} workers: {options["workers"]} '
+                f'rps: {len(latencies) / elapsed:>8.1f} '
+                f'median: {statistics.median(latencies) * 1000:>8.2f} ms '
+                f'p99: {get_percentile(latencies, 99) * 1000:>8.2f} ms'
+            )
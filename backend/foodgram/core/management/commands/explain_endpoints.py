@@ -0,0 +1,160 @@
+''' Command to check query plans of API endpoints. '''
+
+import itertools
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from core.endpoints import get_endpoints, prepare_values, run
+from core.plans import explain, get_full_scans, has_plan
+from core.seeding import seed_dataset
+
+BASELINE_PATH = os.path.join(
+    settings.BASE_DIR, 'core', 'explain_baseline.json'
+)
+
+
+class Rollback(Exception):
+    ''' Raised to roll back the seeded data. '''
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every API endpoint against a seeded database, run EXPLAIN '
+        'for every captured statement reading or writing rows and report '
+        'query counts and full scans of large tables. Fails on regressions '
+        'against the committed baseline. The seeded data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline', default=BASELINE_PATH,
+            help='Path to the baseline file.'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Write the current report to the baseline file.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=200,
+            help='Number of seeded recipes.'
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Print query plans.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Name of endpoint to check, all endpoints by default.'
+        )
+
+    def capture(self, send):
+        with CaptureQueriesContext(connection) as queries:
+            send()
+        return [query['sql'] for query in queries.captured_queries]
+
+    def collect(self, endpoints, recipes_count, show_plans):
+        user, values = seed_dataset(recipes_count)
+        prepare_values(user, values)
+        counter = itertools.count()
+        client = APIClient()
+        client.force_authenticate(user)
+        anonymous = APIClient()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        report = {}
+        for endpoint in endpoints:
+            name = endpoint.name
+            endpoint_client = (anonymous if name.endswith('-anonymous')
+                               else client)
+            # The first request fills caches and builds missing documents.
+            statements = [
+                run(endpoint_client, endpoint,
+                    dict(values, n=next(counter)), self.capture)
+                for _ in range(2)
+            ][-1]
+            full_scans = set()
+            for sql in statements:
+                if not has_plan(sql):
+                    continue
+                plan = explain(sql)
+                full_scans.update(get_full_scans(plan))
+                if show_plans:
+                    self.stdout.write(f'{name}: {sql}')
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
+            report[name] = {
+                'queries': len(statements),
+                'full_scans': sorted(full_scans),
+            }
+        return report
+
+    def compare(self, report, baseline):
+        regressions = []
+        for name, current in report.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if current['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: {current["queries"]} queries, '
+                    f'expected {expected["queries"]}'
+                )
+            new_scans = set(current['full_scans']) - set(
+                expected['full_scans']
+            )
+            if new_scans:
+                regressions.append(
+                    f'{name}: new full scans of {", ".join(sorted(new_scans))}'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        endpoints = get_endpoints(options['endpoints'])
+        report = None
+        # A private cache keeps the seeded rows out of the shared one.
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'explain-endpoints',
+        }}):
+            try:
+                with transaction.atomic():
+                    report = self.collect(
+                        endpoints, options['recipes'], options['plans']
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+        for name, result in report.items():
+            scans = ', '.join(result['full_scans']) or '-'
+            self.stdout.write(
+                f'{name:<36} queries: {result["queries"]:<3} '
+                f'full scans: {scans}'
+            )
+        baselines = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline'], encoding='utf-8') as file:
+                baselines = json.load(file)
+        if options['update_baseline']:
+            if options['endpoints']:
+                report = dict(baselines.get(connection.vendor, {}), **report)
+            baselines[connection.vendor] = report
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(baselines, file, indent=4, sort_keys=True)
+                file.write('\n')
+            self.stdout.write(self.style.SUCCESS('Baseline updated.'))
+            return
+        regressions = self.compare(
+            report, baselines.get(connection.vendor, {})
+        )
+        if regressions:
+            raise CommandError(
+                'Query plan regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
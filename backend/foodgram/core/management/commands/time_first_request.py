@@ -0,0 +1,114 @@
+''' Command to measure time to the first request served by gunicorn. '''
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(url):
+    ''' Request url and return the response status. '''
+    try:
+        with urlopen(url) as response:
+            response.read()
+            return response.status
+    except HTTPError as error:
+        return error.code
+
+
+def start_server(port, arguments=(), **environ):
+    '''
+    Start gunicorn with the project settings on the port and return its
+    process. Arguments override the settings, environ is added to the
+    environment of the server.
+    '''
+    env = dict(os.environ, GUNICORN_BIND=f'127.0.0.1:{port}', **environ)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         *arguments, 'foodgram.wsgi:application'],
+        cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_first_request(server, url, started, timeout):
+    '''
+    Poll url until the server responds and return list with latency
+    of the first served request.
+    '''
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise CommandError('Server exited before serving requests.')
+        request_started = time.perf_counter()
+        try:
+            status = get(url)
+        except URLError:
+            time.sleep(0.01)
+            continue
+        if status >= 500:
+            raise CommandError(f'Server responded with {status}.')
+        return [time.perf_counter() - request_started]
+    raise CommandError('Server did not start in time.')
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn with the project settings and report time to the '
+        'first request served and latencies of the first requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='/api/recipes/',
+            help='Path requested from the started server.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=3,
+            help='Number of requests timed after the server has started.'
+        )
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help='Start the server without warm-up in the master.'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait for the server to start.'
+        )
+
+    def handle(self, *args, **options):
+        port = get_free_port()
+        url = f'http://127.0.0.1:{port}{options["path"]}'
+        started = time.perf_counter()
+        server = start_server(
+            port, GUNICORN_WORKERS='1',
+            GUNICORN_WARMUP='0' if options['no_warmup'] else '1',
+        )
+        try:
+            latencies = wait_first_request(
+                server, url, started, options['timeout']
+            )
+            served = time.perf_counter() - started
+            for _ in range(options['requests'] - 1):
+                request_started = time.perf_counter()
+                get(url)
+                latencies.append(time.perf_counter() - request_started)
+        finally:
+            server.terminate()
+            server.wait()
+        self.stdout.write(f'First request served in {served:.3f} s.')
+        for number, latency in enumerate(latencies, 1):
+            self.stdout.write(
+                f'Request {number}: {latency * 1000:.1f} ms.'
+            )
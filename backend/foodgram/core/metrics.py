@@ -0,0 +1,152 @@
+'''
+Request metrics shared by all processes of the server.
+
+Every process aggregates histograms of request durations and query
+counts by view in memory, and a background thread periodically writes
+them to a file of the process in METRICS_DIR. Metrics are collected by
+summing all files, so they survive worker restarts until the server
+itself restarts.
+'''
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+HISTOGRAMS = (
+    ('duration', 'foodgram_request_duration_seconds',
+     'Duration of requests by view in seconds.', DURATION_BUCKETS),
+    ('queries', 'foodgram_request_queries',
+     'Number of database queries of requests by view.', QUERIES_BUCKETS),
+)
+
+
+def _get_bucket(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+def _new_entry():
+    entry = {}
+    for name, _, _, buckets in HISTOGRAMS:
+        entry[name] = [0] * (len(buckets) + 1)
+        entry[f'{name}_sum'] = 0
+    return entry
+
+
+class MetricsStore:
+    ''' Histograms of requests of the current process. '''
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._entries = {}
+
+    def _start(self):
+        # Runs on the first use in every process, as forked workers
+        # inherit neither threads nor entries of the master.
+        self._pid = os.getpid()
+        self._path = os.path.join(
+            self.directory, f'{self._pid}-{uuid.uuid4().hex[:8]}.json'
+        )
+        self._entries = {}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def observe(self, view, method, duration, queries):
+        ''' Count a request to view. '''
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            entry = self._entries.get((view, method))
+            if entry is None:
+                entry = self._entries[view, method] = _new_entry()
+            values = {'duration': duration, 'queries': queries}
+            for name, _, _, buckets in HISTOGRAMS:
+                value = values[name]
+                entry[name][_get_bucket(buckets, value)] += 1
+                entry[f'{name}_sum'] += value
+
+    def flush(self):
+        ''' Write metrics of the process to its file. '''
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            data = json.dumps([
+                [view, method, entry]
+                for (view, method), entry in self._entries.items()
+            ])
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = f'{self._path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(data)
+        os.replace(temporary_path, self._path)
+
+
+store = MetricsStore(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+
+def clear_metrics():
+    ''' Remove metrics files of all processes. '''
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        os.remove(path)
+
+
+def collect_metrics():
+    ''' Return dict of metrics of all processes by view and method. '''
+    metrics = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path, encoding='utf-8') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for view, method, entry in entries:
+            total = metrics.setdefault((view, method), _new_entry())
+            for key, value in entry.items():
+                if isinstance(value, list):
+                    total[key] = [a + b for a, b in zip(total[key], value)]
+                else:
+                    total[key] += value
+    return metrics
+
+
+def _escape(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+                 .replace('\n', '\\n'))
+
+
+def render_metrics(metrics):
+    ''' Return metrics in Prometheus text exposition format. '''
+    lines = []
+    for name, metric, description, buckets in HISTOGRAMS:
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (view, method), entry in sorted(metrics.items()):
+            labels = f'view="{_escape(view)}",method="{_escape(method)}"'
+            count = 0
+            bounds = [repr(float(bound)) for bound in buckets] + ['+Inf']
+            for bound, value in zip(bounds, entry[name]):
+                count += value
+                lines.append(
+                    f'{metric}_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(f'{metric}_sum{{{labels}}} {entry[name + "_sum"]}')
+            lines.append(f'{metric}_count{{{labels}}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,92 @@
+''' Middleware of the project. '''
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .metrics import store
+
+
+class QueryTimer:
+    ''' Execute wrapper counting queries and their total duration. '''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+@contextmanager
+def record_timing(request, name):
+    '''
+    Add duration of the block to the named timing of the request
+    reported by ServerTimingMiddleware. Does nothing without a request.
+    '''
+    timings = getattr(request, '_timings', None)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = (
+                timings.get(name, 0.0) + time.perf_counter() - started
+            )
+
+
+class ServerTimingMiddleware:
+    '''
+    Time the request, the view, rendering of the response, database
+    queries and steps recorded by views, report them in the
+    'Server-Timing' header and count the request in metrics of the view.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request._timing_marks = {}
+        request._timings = {}
+        queries = QueryTimer()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        finished = time.perf_counter()
+        marks = request._timing_marks
+        timings = [('db', queries.duration, f'queries: {queries.count}')]
+        if 'view' in marks:
+            timings.append(
+                ('view', marks.get('render', finished) - marks['view'], '')
+            )
+        timings.extend(
+            (name, duration, '') for name, duration in request._timings.items()
+        )
+        if 'render' in marks:
+            timings.append(('render', finished - marks['render'], ''))
+        timings.append(('total', finished - started, ''))
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            + (f';desc="{description}"' if description else '')
+            for name, duration, description in timings
+        )
+        match = request.resolver_match
+        store.observe(
+            match.view_name if match else 'unmatched', request.method,
+            finished - started, queries.count
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_marks['view'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called right after the view returns and before rendering.
+        request._timing_marks['render'] = time.perf_counter()
+        return response
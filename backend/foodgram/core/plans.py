@@ -0,0 +1,48 @@
+''' Query plans of captured statements. '''
+
+import re
+
+from django.db import connection
+
+LARGE_TABLES = (
+    'recipes_recipe',
+    'recipes_recipetag',
+    'recipes_recipeingredient',
+    'recipes_favoriterecipe',
+    'recipes_recipeshoppingcart',
+    'recipes_timelineentry',
+    'users_user',
+    'users_usersubscription',
+)
+FULL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$'),
+}
+# Statements which read or write rows and have a query plan.
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def has_plan(sql):
+    return sql.lstrip().upper().startswith(STATEMENTS)
+
+
+def explain(sql):
+    ''' Return lines of the query plan of the statement. '''
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        rows = cursor.fetchall()
+    return [row[-1] for row in rows]
+
+
+def get_full_scans(plan):
+    ''' Return sorted names of large tables fully scanned by the plan. '''
+    pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return sorted({
+        match.group(1) for line in plan
+        for match in [pattern.search(line.strip())]
+        if match and match.group(1) in LARGE_TABLES
+    })
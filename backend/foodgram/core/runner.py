@@ -0,0 +1,47 @@
+''' Test runner of the project. '''
+
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db.migrations.loader import MigrationLoader
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def get_unmigrated_apps():
+    '''
+    Return labels of apps with a migrations package but without
+    migrations, which are not committed and are made on deploy.
+    '''
+    loader = MigrationLoader(None, load=False)
+    loader.load_disk()
+    migrated = {app_label for app_label, _ in loader.disk_migrations}
+    return loader.migrated_apps - migrated
+
+
+class TestRunner(DiscoverRunner):
+    '''
+    Create tables of apps without migrations from their models, and run
+    tests with a process-local cache and a temporary media directory.
+    '''
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.media_root = tempfile.mkdtemp()
+        self.test_settings = override_settings(
+            MIGRATION_MODULES={
+                **settings.MIGRATION_MODULES,
+                **dict.fromkeys(get_unmigrated_apps()),
+            },
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }},
+            MEDIA_ROOT=self.media_root,
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
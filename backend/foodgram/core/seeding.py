@@ -0,0 +1,105 @@
+''' Seeded dataset for checks of API endpoints. '''
+
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from api.pagination import encode_cursor
+
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, RecipeShoppingCart, RecipeTag,
+                            Tag)
+from users.models import UserSubscription
+
+User = get_user_model()
+
+MIN_USERS = 4
+MIN_TAGS = 3
+MIN_INGREDIENTS = 2
+
+
+def seed_dataset(recipes_count, users_count=None, tags_count=MIN_TAGS,
+                 ingredients_count=20):
+    '''
+    Create a dataset and return its main user and dict of values for
+    endpoint URLs. The main user has every third recipe in favorites,
+    every sixth in shopping cart and follows all users but the last.
+    Cursors point to the middle of recipes and subscriptions.
+    '''
+    if users_count is None:
+        users_count = max(recipes_count // 10, MIN_USERS)
+    prefix = uuid.uuid4().hex[:8]
+    users = User.objects.bulk_create(
+        User(email=f'{prefix}-{index}@example.com',
+             username=f'{prefix}-{index}',
+             first_name='First', last_name='Last',
+             password=make_password(None))
+        for index in range(users_count)
+    )
+    if not users[0].pk:
+        users = list(User.objects.filter(username__startswith=prefix))
+    tags = [
+        Tag.objects.create(name=f'{prefix}-{index}',
+                           color=f'#{prefix[:4]}{index:02}',
+                           slug=f'{prefix}-{index}')
+        for index in range(tags_count)
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=f'{prefix}-{index}',
+                                  measurement_unit='g')
+        for index in range(ingredients_count)
+    ]
+    recipes = [
+        Recipe.objects.create(
+            author=users[index % len(users)], name=f'{prefix}-{index}',
+            text='Text', cooking_time=10, image='recipes/seed.png'
+        ) for index in range(recipes_count)
+    ]
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag=tags[index % len(tags)])
+        for index, recipe in enumerate(recipes)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for index, recipe in enumerate(recipes)
+        for ingredient in ingredients[index % 10:index % 10 + 5]
+    )
+    user = users[0]
+    middle = recipes[len(recipes) // 2]
+    FavoriteRecipe.objects.bulk_create(
+        FavoriteRecipe(user=user, recipe=recipe)
+        for recipe in recipes[1::3]
+    )
+    RecipeShoppingCart.objects.bulk_create(
+        RecipeShoppingCart(user=user, recipe=recipe)
+        for recipe in recipes[1::6]
+    )
+    UserSubscription.objects.bulk_create(
+        UserSubscription(subscriber=user, subscribed=author)
+        for author in users[1:-1]
+    )
+    return user, {
+        'prefix': prefix,
+        'author': users[1].id,
+        'other_author': users[-1].id,
+        'recipe': recipes[1].id,
+        'recipe_name': recipes[1].name,
+        'other_recipe': recipes[2].id,
+        'own_recipe': recipes[0].id,
+        'tag': tags[1].slug,
+        'other_tag': tags[2].slug,
+        'tag_id': tags[1].id,
+        'ingredient': ingredients[1].name[:10],
+        'ingredient_id': ingredients[1].id,
+        'tag_ids': [tag.id for tag in tags[:2]],
+        'ingredient_ids': [ingredient.id for ingredient in ingredients[:2]],
+        'recipe_ids': [recipe.id for recipe in recipes[2:12:3]],
+        'author_ids': [users[-1].id],
+        'cursor': encode_cursor(middle, ('-created', '-id')),
+        'popular_cursor': encode_cursor(
+            middle, ('-favorites_count', '-created', '-id')
+        ),
+        'subscriptions_cursor': encode_cursor(users[len(users) // 2],
+                                              ('id',)),
+    }
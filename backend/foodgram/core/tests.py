@@ -0,0 +1,52 @@
+''' Tests for 'core' application. '''
+
+import io
+import re
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.seeding import seed_dataset
+
+
+class ExplainEndpointsTest(TestCase):
+    '''
+    Query counts and full scans of API endpoints do not regress against
+    the committed baseline.
+    '''
+
+    def test_no_regressions_against_baseline(self):
+        output = io.StringIO()
+        try:
+            call_command('explain_endpoints', recipes=20, stdout=output)
+        except CommandError as error:
+            self.fail(str(error))
+        self.assertIn('No regressions.', output.getvalue())
+
+
+class ServerTimingTest(TestCase):
+    ''' Serialization of API responses is reported in Server-Timing. '''
+
+    def setUp(self):
+        cache.clear()
+        self.user, self.values = seed_dataset(10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_timings(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return dict(re.findall(
+            r'(\w+);dur=([\d.]+)', response['Server-Timing']
+        ))
+
+    def test_serialize_timing(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.values["recipe"]}/',
+                    '/api/users/', '/api/users/subscriptions/'):
+            with self.subTest(url=url):
+                timings = self.get_timings(url)
+                self.assertIn('serialize', timings)
+                self.assertLessEqual(float(timings['serialize']),
+                                     float(timings['total']))
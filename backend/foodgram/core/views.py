@@ -0,0 +1,22 @@
+''' Views of the project. '''
+
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from .metrics import collect_metrics, render_metrics, store
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    '''
+    Return request metrics of all processes in Prometheus format.
+    Available only to staff users, scrapers authenticate with a token
+    of a staff user.
+    '''
+    store.flush()
+    return HttpResponse(
+        render_metrics(collect_metrics()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,78 @@
+'''
+Warm-up of the application process before serving requests.
+
+Runs once in the gunicorn master before workers are forked, so workers
+inherit imported modules, compiled URL patterns and loaded catalogs
+instead of paying for them on their first requests.
+'''
+
+import logging
+import time
+
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+from PIL import Image
+
+from api.recipes.serializers import (IngredientSerializer, RecipeSerializer,
+                                     RecipeShortSerializer, TagSerializer,
+                                     UserSubscriptionSerializer)
+from api.users.serializers import UserSerializer
+from recipes.catalog import ingredient_catalog, tag_catalog
+from recipes.search import get_ingredient_index
+
+logger = logging.getLogger(__name__)
+
+SERIALIZERS = (
+    IngredientSerializer,
+    RecipeSerializer,
+    RecipeShortSerializer,
+    TagSerializer,
+    UserSerializer,
+    UserSubscriptionSerializer,
+)
+
+
+def compile_urls():
+    ''' Compile patterns of all URLs and import their views. '''
+    # Reverse dict is populated by walking all URL patterns.
+    return len(get_resolver().reverse_dict)
+
+
+def build_serializers():
+    ''' Build fields of serializers used by API views. '''
+    for serializer_class in SERIALIZERS:
+        serializer_class(context={'request': None}).fields
+    # Image plugins are registered on the first image opened otherwise.
+    Image.init()
+
+
+def load_catalogs():
+    ''' Load tag and ingredient catalogs and the ingredient index. '''
+    tag_catalog.all()
+    ingredient_catalog.all()
+    get_ingredient_index()
+
+
+def close_connections():
+    '''
+    Close connections opened during warm-up, which must not be shared
+    by forked workers.
+    '''
+    connections.close_all()
+    for cache in caches.all():
+        cache.close()
+
+
+def warm_up():
+    ''' Run all warm-up steps and return dict of their durations. '''
+    durations = {}
+    for step in (compile_urls, build_serializers, load_catalogs):
+        started = time.perf_counter()
+        try:
+            step()
+        except DatabaseError as error:
+            logger.warning('Warm-up step %s failed: %s', step.__name__, error)
+        durations[step.__name__] = time.perf_counter() - started
+    close_connections()
+    return durations
@@ -1,6 +1,7 @@
 ''' Project django settings. '''
 
 import os
+import tempfile
 
 from django.utils.translation import gettext_lazy as _
 
@@ -27,6 +28,7 @@ INSTALLED_APPS = [
     'api.recipes.apps.RecipesConfig',
 ]
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +55,7 @@ TEMPLATES = [
     },
 ]
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+TEST_RUNNER = 'core.runner.TestRunner'
 DATABASES = {
     'default': {
         'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.postgresql'),
@@ -69,6 +72,17 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 } """
+# Catalog versions, relation sets, cached tokens and timeline watermarks
+# must be seen by all workers, so the default cache is shared.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.MemcachedCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'memcached:11211'),
+    }
+}
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -84,11 +98,24 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework.authentication.TokenAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('api.authentication.CachedTokenAuthentication',),
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.IsAuthenticated',),
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberLimitPagination',
     'PAGE_SIZE': 6,
 }
+BULK_ACTION_MAX_SIZE = 100
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_LOCAL_TIMEOUT = 10
+TOKEN_CACHE_TIMEOUT = 5 * 60
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 50
+FEED_PULL_INTERVAL = 30
+FEED_PULL_OVERLAP = 60
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_INTERVAL = 5
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.users.serializers.UserSerializer',
@@ -114,3 +141,11 @@ STATIC_URL = '/staticfiles/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/mediafiles/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+EXPORT_FONT = os.environ.get(
+    'EXPORT_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
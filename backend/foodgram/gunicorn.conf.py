@@ -0,0 +1,52 @@
+'''
+Gunicorn settings of the backend.
+
+Workers are threaded, so a slow client or a slow database query holds
+a thread of a worker instead of the whole worker. Numbers of workers
+and threads can be set by the environment.
+
+The application is loaded and warmed up once in the master, and forked
+workers share its memory through copy-on-write.
+
+Workers keep catalogs, relation sets and tokens consistent through the
+default cache, so a single worker is started when the cache is local
+to a process.
+'''
+
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = True
+warmup = os.environ.get('GUNICORN_WARMUP', '1') != '0'
+
+
+def on_starting(server):
+    '''
+    Limit workers to one without a shared cache, reset request metrics
+    and warm up the preloaded application before forking workers.
+    '''
+    from core.caches import is_cache_shared
+    from core.metrics import clear_metrics
+    if server.num_workers > 1 and not is_cache_shared():
+        server.log.warning(
+            'The default cache is local to a process, starting a single '
+            'worker instead of %s. Set CACHE_BACKEND to a shared cache.',
+            server.num_workers
+        )
+        server.num_workers = 1
+    clear_metrics()
+    if warmup:
+        from core.warmup import warm_up
+        for step, duration in warm_up().items():
+            server.log.info('Warm-up %s: %.3f s', step, duration)
+    # Objects created so far are never collected, so the collector
+    # does not touch and copy the pages shared with workers.
+    gc.freeze()
@@ -30,16 +30,28 @@ class RecipeAdmin(admin.ModelAdmin):
     Encapsulate admin options and functionality
     for :model:foodgram.Recipe.
     '''
-    list_display = search_fields = list_filter = (
+    search_fields = list_filter = (
         'name',
         'author',
     )
+    list_display = (
+        'name',
+        'author',
+        'favorites_count',
+        'in_carts_count',
+    )
     fields = (
         'name',
         'author',
         'text',
         'cooking_time',
         'image',
+        'favorites_count',
+        'in_carts_count',
+    )
+    readonly_fields = (
+        'favorites_count',
+        'in_carts_count',
     )
     inlines = (
         RecipeIngredientsInline,
@@ -1,6 +1,7 @@
 ''' Configuration for 'recipes' application. '''
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,3 +11,9 @@ class RecipesConfig(AppConfig):
     '''
     name = 'recipes'
     verbose_name = _('Recipes')
+
+    def ready(self):
+        from . import (catalog, counters, relations,  # noqa: F401
+                       renditions, timeline)
+        from .fulltext import create_search_schema
+        post_migrate.connect(create_search_schema, sender=self)
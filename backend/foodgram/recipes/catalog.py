@@ -0,0 +1,103 @@
+''' Process-local cache of catalog entries for 'recipes' application. '''
+
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Ingredient, Tag
+
+# Sent with the catalog model as sender and ids of changed entries.
+catalog_changed = Signal(providing_args=['ids'])
+
+
+class Catalog:
+    '''
+    Caches entries of a catalog model by id in process memory.
+    Entries are loaded on demand and dropped when the catalog version,
+    shared by all processes through the cache, changes. When the cache
+    does not keep the version, e.g. a dummy cache or an unreachable
+    server, the version of the process is used.
+    '''
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = 'catalog:{}:version'.format(
+            model._meta.label_lower
+        )
+        self._local_version = time.time()
+        self.invalidate()
+
+    @property
+    def version(self):
+        ''' Return the timestamp of the last catalog change. '''
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time(), None)
+            version = cache.get(self.version_key)
+        if version is None:
+            version = self._local_version
+        return version
+
+    def bump_version(self, ids=()):
+        '''
+        Mark the catalog as changed for all processes and notify
+        about changed entries.
+        '''
+        self._local_version = time.time()
+        cache.set(self.version_key, self._local_version, None)
+        self.invalidate()
+        catalog_changed.send(sender=self.model, ids=ids)
+
+    def invalidate(self):
+        ''' Drop all cached entries. '''
+        self._entries = {}
+        self._complete = False
+        self._version = None
+
+    def _sync(self):
+        version = self.version
+        if version != self._version:
+            self.invalidate()
+            self._version = version
+        return self._entries
+
+    def all(self):
+        ''' Return list of all catalog entries in model ordering. '''
+        entries = self._sync()
+        if not self._complete:
+            entries = {
+                entry.id: entry for entry in self.model.objects.all()
+            }
+            self._entries = entries
+            self._complete = True
+        return list(entries.values())
+
+    def get_many(self, ids):
+        '''
+        Return dict of found entries by ids. Missing entries are loaded
+        with a single query.
+        '''
+        entries = self._sync()
+        ids = set(ids)
+        missing = ids - entries.keys()
+        if missing and not self._complete:
+            entries.update(self.model.objects.in_bulk(missing))
+        return {id: entries[id] for id in ids if id in entries}
+
+
+tag_catalog = Catalog(Tag)
+ingredient_catalog = Catalog(Ingredient)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tag_catalog_version(sender, instance, **kwargs):
+    ''' Mark tags as changed on any tag change. '''
+    tag_catalog.bump_version([instance.id])
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_ingredient_catalog_version(sender, instance, **kwargs):
+    ''' Mark ingredients as changed on any ingredient change. '''
+    ingredient_catalog.bump_version([instance.id])
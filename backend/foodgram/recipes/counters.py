@@ -0,0 +1,76 @@
+'''
+Denormalized counters of :model:'recipes.Recipe': number of users with
+the recipe in favorites and in shopping cart.
+'''
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FavoriteRecipe, Recipe, RecipeShoppingCart
+
+COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    RecipeShoppingCart: 'in_carts_count',
+}
+
+
+def change_counter(model, recipe_ids, delta):
+    '''
+    Add delta to the counter of relation model for recipes with a single
+    UPDATE statement. Counters are never decreased below zero.
+    '''
+    field = COUNTERS[model]
+    recipes = Recipe.objects.filter(id__in=recipe_ids)
+    if delta < 0:
+        recipes = recipes.filter(**{f'{field}__gte': -delta})
+    return recipes.update(**{field: F(field) + delta})
+
+
+def get_actual_count(model):
+    ''' Return expression counting relation rows of the outer recipe. '''
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+                     .order_by()
+                     .values('recipe')
+                     .annotate(count=Count('pk'))
+                     .values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def reconcile_counters(recipe_ids):
+    '''
+    Repair counters of recipes which differ from the actual number
+    of relation rows and return number of repaired recipes.
+    '''
+    repaired = set()
+    for model, field in COUNTERS.items():
+        drifted = list(
+            Recipe.objects.filter(id__in=recipe_ids)
+                          .annotate(actual=get_actual_count(model))
+                          .exclude(**{field: F('actual')})
+                          .values_list('id', flat=True)
+        )
+        if drifted:
+            Recipe.objects.filter(id__in=drifted).update(
+                **{field: get_actual_count(model)}
+            )
+            repaired.update(drifted)
+    return len(repaired)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=RecipeShoppingCart)
+def increment_counter(sender, instance, created, **kwargs):
+    ''' Count the recipe added to favorites or shopping cart. '''
+    if created:
+        change_counter(sender, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=RecipeShoppingCart)
+def decrement_counter(sender, instance, **kwargs):
+    ''' Uncount the recipe removed from favorites or shopping cart. '''
+    change_counter(sender, [instance.recipe_id], -1)
@@ -0,0 +1,205 @@
+'''
+Full-text search of recipes by name and description.
+
+PostgreSQL stores a weighted tsvector of russian and english
+configurations in a side table with a GIN index. SQLite uses an FTS5
+virtual table. Other databases fall back to a case-insensitive scan.
+Search tables are created after migrations of the application and kept
+in sync by recipe save and delete signals in the same transaction.
+'''
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Recipe
+from .search import normalize
+
+
+class RawSubquery(RawSQL):
+    ''' Raw subquery for 'in' lookup, which adds parentheses itself. '''
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+class FallbackSearch:
+    ''' Unranked search by substring for databases without full-text. '''
+    table = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_schema(self):
+        pass
+
+    def update(self, recipes):
+        pass
+
+    def delete(self, recipe_ids):
+        pass
+
+    def filter(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+
+
+class PostgresSearch(FallbackSearch):
+    table = 'recipes_recipe_search'
+    document_sql = (
+        "setweight(to_tsvector('russian', %s), 'A') || "
+        "setweight(to_tsvector('english', %s), 'A') || "
+        "setweight(to_tsvector('russian', %s), 'B') || "
+        "setweight(to_tsvector('english', %s), 'B')"
+    )
+    query_sql = (
+        "(plainto_tsquery('russian', %s) || plainto_tsquery('english', %s))"
+    )
+
+    def create_schema(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                'recipe_id integer PRIMARY KEY, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.table}_document_idx '
+                f'ON {self.table} USING gin (document)'
+            )
+
+    def update(self, recipes):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (recipe_id, document) '
+                f'VALUES (%s, {self.document_sql}) '
+                'ON CONFLICT (recipe_id) '
+                'DO UPDATE SET document = EXCLUDED.document',
+                [(id, normalize(name), normalize(name),
+                  normalize(text), normalize(text))
+                 for id, name, text in recipes]
+            )
+
+    def delete(self, recipe_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE recipe_id = ANY(%s)',
+                [list(recipe_ids)]
+            )
+
+    def filter(self, queryset, query):
+        query = normalize(query)
+        matches = RawSubquery(
+            f'SELECT recipe_id FROM {self.table} '
+            f'WHERE document @@ {self.query_sql}',
+            (query, query)
+        )
+        rank = RawSQL(
+            f'SELECT ts_rank(document, {self.query_sql}) '
+            f'FROM {self.table} '
+            f'WHERE recipe_id = {Recipe._meta.db_table}.id',
+            (query, query)
+        )
+        return queryset.filter(id__in=matches).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', '-created', '-id')
+
+
+class SqliteSearch(FallbackSearch):
+    table = 'recipes_recipe_fts'
+
+    def create_schema(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} '
+                "USING fts5(name, text, tokenize='unicode61')"
+            )
+
+    def update(self, recipes):
+        recipes = list(recipes)
+        self.delete([id for id, _, _ in recipes])
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                [(id, normalize(name), normalize(text))
+                 for id, name, text in recipes]
+            )
+
+    def delete(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(recipe_ids))})',
+                recipe_ids
+            )
+
+    def filter(self, queryset, query):
+        # Terms are quoted to not be parsed as FTS5 operators and are
+        # matched by prefix.
+        terms = re.findall(r'\w+', normalize(query))
+        if not terms:
+            return queryset.none()
+        query = ' '.join(f'"{term}"*' for term in terms)
+        matches = RawSubquery(
+            f'SELECT rowid FROM {self.table} '
+            f'WHERE {self.table} MATCH %s',
+            (query,)
+        )
+        # Matches in the name weigh more than in the description.
+        rank = RawSQL(
+            f'SELECT -bm25({self.table}, 10.0, 1.0) '
+            f'FROM {self.table} WHERE {self.table} MATCH %s '
+            f'AND rowid = {Recipe._meta.db_table}.id',
+            (query,)
+        )
+        return queryset.filter(id__in=matches).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', '-created', '-id')
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SqliteSearch,
+}
+
+
+def get_search(using='default'):
+    ''' Return full-text search backend for the database. '''
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, FallbackSearch)(connection)
+
+
+def search_recipes(queryset, query):
+    '''
+    Return recipes of queryset matching the search query, ordered
+    by 'search_rank' annotation when the database supports ranking.
+    '''
+    return get_search(queryset.db).filter(queryset, query)
+
+
+def create_search_schema(sender, using='default', **kwargs):
+    ''' Create search tables after migrations of the application. '''
+    get_search(using).create_schema()
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_document(sender, instance, using, **kwargs):
+    ''' Index name and description of the saved recipe. '''
+    get_search(using).update(
+        [(instance.id, instance.name, instance.text)]
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_search_document(sender, instance, using, **kwargs):
+    ''' Remove the deleted recipe from the search index. '''
+    get_search(using).delete([instance.id])
@@ -0,0 +1,187 @@
+''' Command to export recipes with related objects to a JSON Lines file. '''
+
+import json
+import os
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import (FavoriteRecipe, Recipe, RecipeIngredient,
+                            RecipeShoppingCart, RecipeTag)
+from users.models import UserSubscription
+from .import_ingredients import iter_batches
+
+User = get_user_model()
+
+# Records of every type are written in this order and ordered by id,
+# so the last written record tells where to resume.
+RECORD_TYPES = ('user', 'recipe', 'subscription')
+USER_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def get_user_record(user):
+    return {field: getattr(user, field) for field in USER_FIELDS}
+
+
+def group_by_recipe(queryset, get_value):
+    groups = defaultdict(list)
+    for obj in queryset:
+        groups[obj.recipe_id].append(get_value(obj))
+    return groups
+
+
+def read_last_record(file):
+    '''
+    Return the last complete record of file opened for reading and
+    writing in binary mode, and truncate an incomplete last line.
+    '''
+    end = file.seek(0, os.SEEK_END)
+    position = end
+    tail = b''
+    while position > 0:
+        position = max(position - 64 * 1024, 0)
+        file.seek(position)
+        tail = file.read(end - position)
+        if tail.count(b'\n') >= 2 or (position == 0 and b'\n' in tail):
+            break
+    if b'\n' not in tail:
+        file.truncate(position)
+        return None
+    complete, _, incomplete = tail.rpartition(b'\n')
+    file.truncate(end - len(incomplete))
+    last_line = complete.rpartition(b'\n')[2]
+    return json.loads(last_line) if last_line.strip() else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Export users, recipes with their tags, ingredients, favorites '
+        'and shopping carts, and subscriptions to a JSON Lines file, '
+        'one self-contained object per line. Image files are referenced '
+        'by name and are not exported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the file.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of objects read in one batch.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue an interrupted export to the existing file.'
+        )
+
+    def iter_users(self, after_id, batch_size):
+        users = User.objects.filter(id__gt=after_id).order_by('id')
+        for user in users.iterator(chunk_size=batch_size):
+            yield dict(type='user', id=user.id, **get_user_record(user))
+
+    def iter_recipes(self, after_id, batch_size):
+        '''
+        Yield recipe records. Recipes are read with a server-side cursor
+        where supported, their relations with a query per batch.
+        '''
+        recipes = Recipe.objects.filter(id__gt=after_id).select_related(
+            'author'
+        ).order_by('id').iterator(chunk_size=batch_size)
+        for batch in iter_batches(recipes, batch_size):
+            ids = [recipe.id for recipe in batch]
+            tags = group_by_recipe(
+                RecipeTag.objects.filter(recipe_id__in=ids)
+                                 .select_related('tag').order_by('id'),
+                lambda item: {'name': item.tag.name,
+                              'color': item.tag.color,
+                              'slug': item.tag.slug}
+            )
+            ingredients = group_by_recipe(
+                RecipeIngredient.objects.filter(recipe_id__in=ids)
+                                        .select_related('ingredient')
+                                        .order_by('id'),
+                lambda item: {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+            )
+            favorited_by, in_shopping_carts = (
+                group_by_recipe(
+                    model.objects.filter(recipe_id__in=ids)
+                                 .select_related('user').order_by('id'),
+                    lambda item: item.user.email
+                )
+                for model in (FavoriteRecipe, RecipeShoppingCart)
+            )
+            for recipe in batch:
+                yield {
+                    'type': 'recipe',
+                    'id': recipe.id,
+                    'author': get_user_record(recipe.author),
+                    'name': recipe.name,
+                    'text': recipe.text,
+                    'cooking_time': recipe.cooking_time,
+                    'image': recipe.image.name,
+                    'created': recipe.created.isoformat(),
+                    'tags': tags[recipe.id],
+                    'ingredients': ingredients[recipe.id],
+                    'favorited_by': favorited_by[recipe.id],
+                    'in_shopping_carts': in_shopping_carts[recipe.id],
+                }
+
+    def iter_subscriptions(self, after_id, batch_size):
+        subscriptions = UserSubscription.objects.filter(
+            id__gt=after_id
+        ).select_related('subscriber', 'subscribed').order_by('id')
+        for subscription in subscriptions.iterator(chunk_size=batch_size):
+            yield {
+                'type': 'subscription',
+                'id': subscription.id,
+                'subscriber': subscription.subscriber.email,
+                'subscribed': subscription.subscribed.email,
+            }
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+        path = options['path']
+        last = None
+        try:
+            if options['resume'] and os.path.exists(path):
+                with open(path, 'r+b') as file:
+                    last = read_last_record(file)
+            mode = 'a' if options['resume'] else 'w'
+            with open(path, mode, encoding='utf-8') as file:
+                counts = self.export(file, last, options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Export failed: {error!r}')
+        self.stdout.write(self.style.SUCCESS(', '.join(
+            f'{record_type.capitalize()}s: {counts[record_type]}'
+            for record_type in RECORD_TYPES
+        ) + '.'))
+
+    def export(self, file, last, batch_size):
+        ''' Write records after the last one and return their counts. '''
+        iterators = {
+            'user': self.iter_users,
+            'recipe': self.iter_recipes,
+            'subscription': self.iter_subscriptions,
+        }
+        start = 0
+        if last is not None:
+            start = RECORD_TYPES.index(last['type'])
+        counts = dict.fromkeys(RECORD_TYPES, 0)
+        with transaction.atomic():
+            for index, record_type in enumerate(RECORD_TYPES):
+                if index < start:
+                    continue
+                after_id = last['id'] if index == start and last else 0
+                records = iterators[record_type](after_id, batch_size)
+                for batch in iter_batches(records, batch_size):
+                    file.write(''.join(
+                        json.dumps(record, ensure_ascii=False) + '\n'
+                        for record in batch
+                    ))
+                    counts[record_type] += len(batch)
+        return counts
@@ -0,0 +1,47 @@
+''' Command to generate image renditions of existing recipes. '''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.models import Recipe
+from recipes.renditions import generate_renditions
+
+
+def generate(name):
+    ''' Generate renditions of the image, return error text if failed. '''
+    try:
+        generate_renditions(name)
+    except OSError as error:
+        return f'{name}: {error}'
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Generate missing image renditions of all recipes in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes.'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Recipe.objects.exclude(image='')
+                          .values_list('image', flat=True).distinct()
+        )
+        # Workers don't use the database, the forked connections must not
+        # be shared with them.
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for error in executor.map(generate, names, chunksize=16):
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed: {len(names) - failed}, failed: {failed}.'
+        ))
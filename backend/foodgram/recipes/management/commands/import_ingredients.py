@@ -0,0 +1,158 @@
+''' Command to import the ingredient catalog from a file. '''
+
+import csv
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.catalog import ingredient_catalog
+from recipes.models import Ingredient
+
+FORMATS = {
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+}
+FIELDS = ('name', 'measurement_unit')
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    ''' Yield items of a JSON array from file without loading it whole. '''
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('JSON file must contain an array.')
+            buffer = buffer[1:].lstrip()
+            started = True
+        if started and buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if started and buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Unexpected end of JSON file.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_json_lines(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_records(file, file_format):
+    '''
+    Yield (name, measurement_unit) records from JSON fixture, JSON Lines
+    or CSV file.
+    '''
+    if file_format == 'csv':
+        for row in csv.reader(file):
+            if row and tuple(row[:2]) != FIELDS:
+                yield row[0], row[1]
+        return
+    items = (iter_json_array(file) if file_format == 'json'
+             else iter_json_lines(file))
+    for item in items:
+        fields = item.get('fields', item)
+        yield fields['name'], fields['measurement_unit']
+
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Import ingredients from JSON fixture, JSON Lines or CSV file. '
+        'Existing ingredients are matched by name, so the import can be '
+        'safely repeated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the file.')
+        parser.add_argument(
+            '--format', choices=sorted(set(FORMATS.values())),
+            help='File format, detected by extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of records written in one batch.'
+        )
+
+    def import_batch(self, batch):
+        '''
+        Write a batch and return inserted, updated, skipped counts.
+        Ids of updated ingredients are collected to notify the catalog.
+        '''
+        records = dict(batch)
+        skipped = len(batch) - len(records)
+        existing = Ingredient.objects.in_bulk(
+            list(records), field_name='name'
+        )
+        created = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in records.items()
+            if name not in existing
+        ]
+        updated = []
+        for name, ingredient in existing.items():
+            if ingredient.measurement_unit == records[name]:
+                skipped += 1
+            else:
+                ingredient.measurement_unit = records[name]
+                updated.append(ingredient)
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(created, ignore_conflicts=True)
+            Ingredient.objects.bulk_update(updated, ['measurement_unit'])
+        self.updated_ids.extend(ingredient.id for ingredient in updated)
+        return len(created), len(updated), skipped
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or FORMATS.get(os.path.splitext(path)[1].lower()))
+        if file_format is None:
+            raise CommandError(
+                'Unknown file format, use --format option.'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+        inserted = updated = skipped = 0
+        self.updated_ids = []
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                records = iter_records(file, file_format)
+                for batch in iter_batches(records, options['batch_size']):
+                    counts = self.import_batch(batch)
+                    inserted += counts[0]
+                    updated += counts[1]
+                    skipped += counts[2]
+        except (OSError, KeyError, IndexError, ValueError) as error:
+            raise CommandError(f'Invalid input: {error!r}')
+        finally:
+            ingredient_catalog.bump_version(self.updated_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted: {inserted}, updated: {updated}, skipped: {skipped}.'
+        ))
@@ -0,0 +1,256 @@
+''' Command to import recipes with related objects from a JSON Lines file. '''
+
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.catalog import ingredient_catalog, tag_catalog
+from recipes.fulltext import get_search
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, RecipeShoppingCart, RecipeTag,
+                            Tag)
+from recipes.relations import invalidate_relation_ids
+from users.models import UserSubscription
+from .export_recipes import USER_FIELDS
+from .import_ingredients import iter_batches, iter_json_lines
+
+User = get_user_model()
+
+
+def get_ids(model, field, values):
+    ''' Return dict of ids of model objects by unique field values. '''
+    return dict(model.objects.filter(
+        **{f'{field}__in': set(values)}
+    ).values_list(field, 'id'))
+
+
+def create_missing(model, field, objects):
+    '''
+    Create objects missing by unique field value and return dict of ids
+    of all objects by the field value and number of created objects.
+    Objects conflicting with others by other unique fields are skipped.
+    '''
+    objects = {getattr(obj, field): obj for obj in objects}
+    ids = get_ids(model, field, objects)
+    missing = [value for value in objects if value not in ids]
+    if not missing:
+        return ids, 0
+    model.objects.bulk_create(
+        [objects[value] for value in missing], ignore_conflicts=True
+    )
+    created = get_ids(model, field, missing)
+    ids.update(created)
+    return ids, len(created)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users, recipes and subscriptions from a JSON Lines file '
+        'written by export_recipes. Objects are written in batches and '
+        'matched by natural keys: users by email, tags by slug, '
+        'ingredients and recipes by name. Existing objects are skipped, '
+        'so an interrupted import is resumed by running it again. '
+        'Imported users get unusable passwords.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the file.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of records written in one batch.'
+        )
+
+    def import_users(self, records):
+        '''
+        Create missing users and return dict of user ids by email and
+        number of created users.
+        '''
+        return create_missing(User, 'email', (
+            User(password=make_password(None),
+                 **{field: record[field] for field in USER_FIELDS})
+            for record in records
+        ))
+
+    def import_catalogs(self, records):
+        ''' Return dicts of tag ids by slug and ingredient ids by name. '''
+        tag_ids, tags_created = create_missing(Tag, 'slug', (
+            Tag(name=tag['name'], color=tag['color'], slug=tag['slug'])
+            for record in records for tag in record['tags']
+        ))
+        ingredient_ids, ingredients_created = create_missing(
+            Ingredient, 'name', (
+                Ingredient(name=ingredient['name'],
+                           measurement_unit=ingredient['measurement_unit'])
+                for record in records
+                for ingredient in record['ingredients']
+            )
+        )
+        self.tags_changed |= bool(tags_created)
+        self.ingredients_changed |= bool(ingredients_created)
+        return tag_ids, ingredient_ids
+
+    def import_recipes(self, records):
+        '''
+        Write recipes missing by name with their relations and return
+        number of written recipes. Signal receivers are not called by bulk
+        writes, so counters and the search index are written here.
+        '''
+        existing = get_ids(Recipe, 'name', [
+            record['name'] for record in records
+        ])
+        records = list({
+            record['name']: record for record in records
+            if record['name'] not in existing
+        }.values())
+        if not records:
+            return 0
+        user_ids, _ = self.import_users(
+            [record['author'] for record in records]
+        )
+        user_ids.update(get_ids(User, 'email', [
+            email for record in records
+            for email in record['favorited_by'] + record['in_shopping_carts']
+        ]))
+        tag_ids, ingredient_ids = self.import_catalogs(records)
+        relations = {}
+        recipes = []
+        for record in records:
+            author_id = user_ids.get(record['author']['email'])
+            if author_id is None:
+                continue
+            favorited_by, in_shopping_carts = (
+                {user_ids[email] for email in record[key]
+                 if email in user_ids}
+                for key in ('favorited_by', 'in_shopping_carts')
+            )
+            relations[record['name']] = (
+                record, favorited_by, in_shopping_carts
+            )
+            recipes.append(Recipe(
+                author_id=author_id,
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                favorites_count=len(favorited_by),
+                in_carts_count=len(in_shopping_carts),
+            ))
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            recipe_ids = get_ids(Recipe, 'name', relations)
+            for recipe in recipes:
+                recipe.id = recipe_ids[recipe.name]
+                recipe.created = parse_datetime(
+                    relations[recipe.name][0]['created']
+                )
+            Recipe.objects.bulk_update(recipes, ['created'])
+            self.write_relations(recipe_ids, relations, tag_ids,
+                                 ingredient_ids)
+            get_search().update(
+                (recipe.id, recipe.name, recipe.text) for recipe in recipes
+            )
+        return len(recipes)
+
+    def write_relations(self, recipe_ids, relations, tag_ids,
+                        ingredient_ids):
+        tags, ingredients, favorites, shopping_carts = [], [], [], []
+        for name, (record, favorited_by, in_shopping_carts) in (
+                relations.items()):
+            recipe_id = recipe_ids[name]
+            tags.extend(
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_ids[slug])
+                for slug in {tag['slug'] for tag in record['tags']}
+                if slug in tag_ids
+            )
+            amounts = {
+                ingredient['name']: ingredient['amount']
+                for ingredient in record['ingredients']
+            }
+            ingredients.extend(
+                RecipeIngredient(recipe_id=recipe_id,
+                                 ingredient_id=ingredient_ids[ingredient],
+                                 amount=amount)
+                for ingredient, amount in amounts.items()
+                if ingredient in ingredient_ids
+            )
+            favorites.extend(
+                FavoriteRecipe(user_id=user_id, recipe_id=recipe_id)
+                for user_id in favorited_by
+            )
+            shopping_carts.extend(
+                RecipeShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                for user_id in in_shopping_carts
+            )
+        RecipeTag.objects.bulk_create(tags)
+        RecipeIngredient.objects.bulk_create(ingredients)
+        FavoriteRecipe.objects.bulk_create(favorites)
+        RecipeShoppingCart.objects.bulk_create(shopping_carts)
+        for relation, objects in (('favorite_recipes', favorites),
+                                  ('shopping_cart', shopping_carts)):
+            for user_id in {obj.user_id for obj in objects}:
+                invalidate_relation_ids(user_id, relation)
+
+    def import_subscriptions(self, records):
+        ''' Write missing subscriptions and return their number. '''
+        user_ids = get_ids(User, 'email', itertools.chain.from_iterable(
+            (record['subscriber'], record['subscribed'])
+            for record in records
+        ))
+        subscriptions = {
+            (user_ids[record['subscriber']], user_ids[record['subscribed']])
+            for record in records
+            if record['subscriber'] in user_ids
+            and record['subscribed'] in user_ids
+            and record['subscriber'] != record['subscribed']
+        }
+        with transaction.atomic():
+            UserSubscription.objects.bulk_create([
+                UserSubscription(subscriber_id=subscriber_id,
+                                 subscribed_id=subscribed_id)
+                for subscriber_id, subscribed_id in subscriptions
+            ], ignore_conflicts=True)
+            for subscriber_id in {ids[0] for ids in subscriptions}:
+                invalidate_relation_ids(subscriber_id, 'subscriptions')
+        return len(subscriptions)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+        importers = {
+            'user': lambda records: self.import_users(records)[1],
+            'recipe': self.import_recipes,
+            'subscription': self.import_subscriptions,
+        }
+        counts = dict.fromkeys(importers, 0)
+        processed = 0
+        self.tags_changed = self.ingredients_changed = False
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                records = iter_json_lines(file)
+                for record_type, group in itertools.groupby(
+                        records, key=lambda record: record['type']):
+                    if record_type not in importers:
+                        raise CommandError(
+                            f'Unknown record type: {record_type!r}.'
+                        )
+                    for batch in iter_batches(group, options['batch_size']):
+                        counts[record_type] += importers[record_type](batch)
+                        processed += len(batch)
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            raise CommandError(
+                f'Invalid input after {processed} records: {error!r}'
+            )
+        finally:
+            if self.tags_changed:
+                tag_catalog.bump_version()
+            if self.ingredients_changed:
+                ingredient_catalog.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed: {processed}, users: {counts["user"]}, '
+            f'recipes: {counts["recipe"]}, '
+            f'subscriptions: {counts["subscription"]}.'
+        ))
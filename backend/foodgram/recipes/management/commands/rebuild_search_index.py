@@ -0,0 +1,42 @@
+''' Command to rebuild the full-text search index of recipes. '''
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.fulltext import get_search
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the full-text search table if missing and index names '
+        'and descriptions of all recipes in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of recipes indexed in one batch.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Batch size must be positive.')
+        search = get_search()
+        search.create_schema()
+        indexed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(id__gt=last_id)
+                              .order_by('id')
+                              .values_list('id', 'name', 'text')[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                search.update(batch)
+            indexed += len(batch)
+            last_id = batch[-1][0]
+        self.stdout.write(self.style.SUCCESS(f'Indexed: {indexed}.'))
@@ -0,0 +1,40 @@
+''' Command to repair denormalized counters of recipes. '''
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import reconcile_counters
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount favorites and shopping carts of all recipes in batches '
+        'and repair counters which drifted from the actual numbers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of recipes checked in one batch.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Batch size must be positive.')
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(id__gt=last_id)
+                              .order_by('id')
+                              .values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            repaired += reconcile_counters(batch)
+            checked += len(batch)
+            last_id = batch[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked: {checked}, repaired: {repaired}.'
+        ))
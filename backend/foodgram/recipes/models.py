@@ -99,9 +99,47 @@ class Recipe(models.Model):
         help_text=_('''The recipe's publication date'''),
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name=_('Favorites count'),
+        help_text=_('''Number of users with the recipe in favorites'''),
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name=_('Shopping carts count'),
+        help_text=_('''Number of users with the recipe in shopping cart'''),
+        default=0,
+        editable=False,
+    )
+    fanned_out = models.BooleanField(
+        verbose_name=_('Fanned out'),
+        help_text=_('''Whether the recipe is written to timelines '''
+                    '''of the author's followers'''),
+        default=False,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
+        indexes = [
+            models.Index(
+                fields=['author', '-created'],
+                name='recipe_author_created_idx'
+            ),
+            models.Index(
+                fields=['-created', '-id'],
+                name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-created', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['author', '-created'],
+                name='recipe_not_fanned_out_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
         verbose_name = _('Recipe')
         verbose_name_plural = _('Recipes')
 
@@ -236,3 +274,80 @@ class RecipeShoppingCart(models.Model):
             ),
         ]
         verbose_name = verbose_name_plural = _('Shopping cart')
+
+
+class RecipeDocument(models.Model):
+    '''
+    Stores the precomputed API representation of
+    :model:'recipes.Recipe' without per-user data.
+    '''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name=_('Recipe'),
+    )
+    data = models.TextField(
+        verbose_name=_('Document'),
+        help_text=_('''The recipe's representation in JSON'''),
+    )
+    updated = models.DateTimeField(
+        verbose_name=_('Update date'),
+        help_text=_('''The document's update date'''),
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = _('Recipe document')
+        verbose_name_plural = _('Recipe documents')
+
+
+class TimelineEntry(models.Model):
+    '''
+    Stores :model:'recipes.Recipe' in the timeline of
+    :model:'users.User' following the recipe author.
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name=_('User'),
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Recipe'),
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Author'),
+    )
+    created = models.DateTimeField(
+        verbose_name=_('Publication date'),
+        help_text=_('''The recipe's publication date'''),
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='timeline_user_recipe_exists'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-recipe'],
+                name='timeline_user_created_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+        verbose_name = _('Timeline entry')
+        verbose_name_plural = _('Timeline entries')
@@ -0,0 +1,194 @@
+'''
+Per-user cache of relation sets: favorite recipes, recipes in shopping
+cart and subscriptions.
+'''
+
+import uuid
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import UserSubscription
+from .counters import COUNTERS, change_counter
+from .models import FavoriteRecipe, RecipeShoppingCart
+from .timeline import backfill_timeline, remove_from_timeline
+
+RELATIONS = {
+    'favorite_recipes': (FavoriteRecipe, 'user_id', 'recipe_id'),
+    'shopping_cart': (RecipeShoppingCart, 'user_id', 'recipe_id'),
+    'subscriptions': (UserSubscription, 'subscriber_id', 'subscribed_id'),
+}
+RELATIONS_TIMEOUT = 60 * 60
+
+
+def _get_version_key(user_id, relation):
+    return 'relations:{}:{}:version'.format(user_id, relation)
+
+
+def _get_key(user_id, relation, version):
+    return 'relations:{}:{}:{}'.format(user_id, relation, version)
+
+
+def _get_version(user_id, relation):
+    version_key = _get_version_key(user_id, relation)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_relation_ids(request, relation):
+    '''
+    Return set of related object ids for request user. The set is loaded
+    from the database on cache miss and memoized for the request.
+
+    Sets are cached under a per-user version, which is replaced on every
+    change. A set loaded before a concurrent change commits is stored
+    under the old version and never read again.
+    '''
+    memo = request.__dict__.setdefault('_relations', {})
+    if relation not in memo:
+        user = request.user
+        key = _get_key(user.id, relation, _get_version(user.id, relation))
+        ids = cache.get(key)
+        if ids is None:
+            model, user_field, related_field = RELATIONS[relation]
+            ids = frozenset(model.objects.filter(
+                **{user_field: user.id}
+            ).values_list(related_field, flat=True))
+            cache.add(key, ids, RELATIONS_TIMEOUT)
+        memo[relation] = ids
+    return memo[relation]
+
+
+def invalidate_relation_ids(user_id, relation):
+    '''
+    Replace the version of the cached set after the current transaction
+    commits, so the next read loads it from the database.
+    '''
+    transaction.on_commit(lambda: cache.set(
+        _get_version_key(user_id, relation), uuid.uuid4().hex, None
+    ))
+
+
+def _execute_returning(model, sql, params, delta):
+    '''
+    Execute statement returning changed related ids and change recipe
+    counters of the relation model by delta in the same transaction.
+    '''
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = {row[0] for row in cursor.fetchall()}
+        if ids and model in COUNTERS:
+            change_counter(model, ids, delta)
+    return ids
+
+
+def add_relations(user_id, relation, related_ids):
+    '''
+    Add existing objects by ids to the relation set of the user with
+    a single INSERT ... ON CONFLICT DO NOTHING statement, so repeated and
+    concurrent requests never fail on the unique constraint. Return ids
+    of added objects; missing and already related ids are skipped.
+    '''
+    related_ids = list(related_ids)
+    if not related_ids:
+        return set()
+    model, user_field, related_field = RELATIONS[relation]
+    user_field = model._meta.get_field(user_field)
+    related_field = model._meta.get_field(related_field)
+    related_model = related_field.related_model
+    quote = connection.ops.quote_name
+    pk = quote(related_model._meta.pk.column)
+    params = [user_id, *related_ids]
+    condition = ''
+    if related_model is user_field.related_model:
+        # Users can't be related to themselves.
+        condition = f' AND {pk} <> %s'
+        params.append(user_id)
+    added = _execute_returning(
+        model,
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({quote(user_field.column)}, {quote(related_field.column)}) '
+        f'SELECT %s, {pk} FROM {quote(related_model._meta.db_table)} '
+        f'WHERE {pk} IN ({", ".join(["%s"] * len(related_ids))})'
+        f'{condition} '
+        f'ON CONFLICT DO NOTHING RETURNING {quote(related_field.column)}',
+        params, 1
+    )
+    if added:
+        invalidate_relation_ids(user_id, relation)
+        if relation == 'subscriptions':
+            backfill_timeline(user_id, added)
+    return added
+
+
+def remove_relations(user_id, relation, related_ids):
+    '''
+    Remove objects by ids from the relation set of the user with
+    a single DELETE statement. Return ids of removed objects.
+    '''
+    related_ids = list(related_ids)
+    if not related_ids:
+        return set()
+    model, user_field, related_field = RELATIONS[relation]
+    user_column = model._meta.get_field(user_field).column
+    related_column = model._meta.get_field(related_field).column
+    quote = connection.ops.quote_name
+    removed = _execute_returning(
+        model,
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote(user_column)} = %s AND {quote(related_column)} '
+        f'IN ({", ".join(["%s"] * len(related_ids))}) '
+        f'RETURNING {quote(related_column)}',
+        [user_id, *related_ids], -1
+    )
+    if removed:
+        invalidate_relation_ids(user_id, relation)
+        if relation == 'subscriptions':
+            remove_from_timeline(user_id, removed)
+    return removed
+
+
+def _get_relation(sender):
+    for relation, (model, user_field, related_field) in RELATIONS.items():
+        if model is sender:
+            return relation, user_field, related_field
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=RecipeShoppingCart)
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=RecipeShoppingCart)
+@receiver(post_delete, sender=UserSubscription)
+def change_relation(sender, instance, **kwargs):
+    ''' Invalidate the cached set of the user. '''
+    relation, user_field, _ = _get_relation(sender)
+    invalidate_relation_ids(getattr(instance, user_field), relation)
+
+
+@receiver(m2m_changed, sender=UserSubscription)
+def change_subscriptions(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    '''
+    Invalidate cached subscriptions on changes made through
+    :model:'users.User' subscriptions manager, which bypass
+    save signals of :model:'users.UserSubscription'.
+    '''
+    if reverse and action == 'pre_clear':
+        # Subscribers of the cleared user are known only before clear.
+        pk_set = UserSubscription.objects.filter(
+            subscribed_id=instance.id
+        ).values_list('subscriber_id', flat=True)
+    elif action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_relation_ids(instance.id, 'subscriptions')
+    elif action != 'post_clear':
+        for user_id in pk_set or ():
+            invalidate_relation_ids(user_id, 'subscriptions')
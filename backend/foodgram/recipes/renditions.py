@@ -0,0 +1,153 @@
+''' Recipe image renditions for 'recipes' application. '''
+
+import functools
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+
+RENDITIONS_DIR = 'recipes/renditions'
+RENDITION_WIDTHS = (200, 400, 800)
+RENDITION_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True,
+                             'progressive': True}),
+}
+if features.check('webp'):
+    RENDITION_FORMATS['webp'] = ('WEBP', 'webp', {'quality': 80, 'method': 4})
+
+# Number of images whose renditions are known to exist, to skip
+# storage lookups for recently shown images.
+RENDITIONS_MEMO_SIZE = 4096
+
+
+def get_rendition_names(name):
+    ''' Return dict of rendition names by (format, width). '''
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return {
+        (file_format, width): '{}/{}-{}w.{}'.format(
+            RENDITIONS_DIR, stem, width, extension
+        )
+        for file_format, (_, extension, _) in RENDITION_FORMATS.items()
+        for width in RENDITION_WIDTHS
+    }
+
+
+def save_atomically(name, content):
+    '''
+    Write content to a temporary file and rename it over the file of the
+    storage, so concurrent writers replace the file instead of saving
+    copies under new names and readers never see a partial file.
+    '''
+    path = default_storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix='.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.chmod(temporary_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def delete_renditions(name):
+    ''' Delete renditions of the image unless a recipe still uses it. '''
+    if Recipe.objects.filter(image=name).exists():
+        return
+    for rendition_name in get_rendition_names(name).values():
+        default_storage.delete(rendition_name)
+    generate_renditions.cache_clear()
+
+
+@functools.lru_cache(maxsize=RENDITIONS_MEMO_SIZE)
+def generate_renditions(name):
+    '''
+    Create missing renditions of the image and return dict of their
+    names. The renditions are memoized in the storage, names of recently
+    used images are memoized in the process.
+    '''
+    names = get_rendition_names(name)
+    missing = {
+        key: rendition_name for key, rendition_name in names.items()
+        if not default_storage.exists(rendition_name)
+    }
+    if missing:
+        with default_storage.open(name) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        for (file_format, width), rendition_name in missing.items():
+            pillow_format, _, options = RENDITION_FORMATS[file_format]
+            rendition = image.convert(
+                'RGB' if pillow_format == 'JPEG' else 'RGBA'
+            )
+            rendition.thumbnail((width, image.height))
+            buffer = BytesIO()
+            rendition.save(buffer, pillow_format, **options)
+            save_atomically(rendition_name, buffer.getvalue())
+    return names
+
+
+def get_rendition_urls(image):
+    '''
+    Return srcset-style map of rendition urls by format and width,
+    generating missing renditions. Empty if the image can't be read.
+    '''
+    if not image:
+        return {}
+    try:
+        names = generate_renditions(image.name)
+    except OSError:
+        return {}
+    urls = {}
+    for (file_format, width), name in names.items():
+        urls.setdefault(file_format, {})[f'{width}w'] = (
+            default_storage.url(name)
+        )
+    return urls
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_replaced_image(sender, instance, update_fields=None, **kwargs):
+    ''' Remember the name of the image replaced by the save. '''
+    instance._replaced_image = None
+    if instance.pk is None or (update_fields is not None
+                               and 'image' not in update_fields):
+        return
+    previous = Recipe.objects.filter(pk=instance.pk).values_list(
+        'image', flat=True
+    ).first()
+    if previous and previous != instance.image.name:
+        instance._replaced_image = previous
+
+
+@receiver(post_save, sender=Recipe)
+def generate_recipe_renditions(sender, instance, **kwargs):
+    '''
+    Generate renditions of the saved recipe image and delete renditions
+    of the replaced one after commit.
+    '''
+    replaced = getattr(instance, '_replaced_image', None)
+    if replaced:
+        transaction.on_commit(lambda: delete_renditions(replaced))
+    if instance.image.name:
+        transaction.on_commit(lambda: get_rendition_urls(instance.image))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_renditions(sender, instance, **kwargs):
+    ''' Delete renditions of the deleted recipe image after commit. '''
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: delete_renditions(name))
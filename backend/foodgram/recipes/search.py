@@ -0,0 +1,63 @@
+''' In-memory search indexes for 'recipes' application. '''
+
+from bisect import bisect_left
+
+from .catalog import ingredient_catalog
+
+
+def normalize(value):
+    ''' Return value prepared for case- and 'ё'-insensitive comparison. '''
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    '''
+    Immutable index of ingredient names, sorted by normalized name.
+    Prefix matches are found by binary search, substring matches by scan.
+    '''
+
+    def __init__(self, ingredients, version=None):
+        entries = sorted(
+            ((normalize(ingredient.name), ingredient)
+             for ingredient in ingredients),
+            key=lambda entry: entry[0],
+        )
+        self.keys = tuple(key for key, _ in entries)
+        self.ingredients = tuple(ingredient for _, ingredient in entries)
+        self.version = version
+
+    def search(self, query, limit):
+        '''
+        Return up to 'limit' ingredients which names start with query,
+        followed by ingredients which names contain it.
+        '''
+        query = normalize(query)
+        keys = self.keys
+        start = end = bisect_left(keys, query)
+        while end < len(keys) and end - start < limit:
+            if not keys[end].startswith(query):
+                break
+            end += 1
+        found = list(self.ingredients[start:end])
+        for index, key in enumerate(keys):
+            if len(found) >= limit:
+                break
+            if query in key and not start <= index < end:
+                found.append(self.ingredients[index])
+        return found
+
+
+# Built on the first use.
+_ingredient_index = None
+
+
+def get_ingredient_index():
+    ''' Return the index of the current ingredient catalog. '''
+    global _ingredient_index
+    if (_ingredient_index is None
+            or _ingredient_index.version != ingredient_catalog.version):
+        version = ingredient_catalog.version
+        _ingredient_index = IngredientIndex(
+            ingredient_catalog.all(), version
+        )
+    return _ingredient_index
@@ -0,0 +1,116 @@
+''' Tests for 'recipes' application. '''
+
+import io
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from .catalog import ingredient_catalog
+from .models import Ingredient
+from .renditions import (RENDITIONS_MEMO_SIZE, delete_renditions,
+                         generate_renditions)
+from .search import IngredientIndex, get_ingredient_index
+
+
+class IngredientIndexTest(SimpleTestCase):
+    ''' Search of ingredients by name in the in-memory index. '''
+
+    def setUp(self):
+        self.index = IngredientIndex([
+            Ingredient(id=id, name=name, measurement_unit='g')
+            for id, name in enumerate(
+                ('Соль', 'Сахар', 'Морская соль', 'Свёкла', 'Соус',
+                 'Фасоль'), 1
+            )
+        ])
+
+    def search(self, query, limit=10):
+        return [ingredient.name
+                for ingredient in self.index.search(query, limit)]
+
+    def test_prefix_matches_go_first(self):
+        self.assertEqual(self.search('со'),
+                         ['Соль', 'Соус', 'Морская соль', 'Фасоль'])
+
+    def test_search_ignores_case_and_yo(self):
+        self.assertEqual(self.search('СВЕ'), ['Свёкла'])
+        self.assertEqual(self.search('свё'), ['Свёкла'])
+
+    def test_limit(self):
+        self.assertEqual(self.search('со', 1), ['Соль'])
+        self.assertEqual(self.search('со', 3),
+                         ['Соль', 'Соус', 'Морская соль'])
+
+    def test_no_matches(self):
+        self.assertEqual(self.search('перец'), [])
+
+
+class IngredientIndexVersionTest(TestCase):
+    '''
+    The index is built on the first use and rebuilt when the ingredient
+    catalog changes, also when the cache does not keep the version.
+    '''
+
+    def setUp(self):
+        cache.clear()
+        ingredient_catalog.invalidate()
+        Ingredient.objects.create(name='Соль', measurement_unit='g')
+
+    def check_index(self):
+        self.assertEqual(
+            [ingredient.name
+             for ingredient in get_ingredient_index().search('со', 10)],
+            ['Соль']
+        )
+        Ingredient.objects.create(name='Соус', measurement_unit='g')
+        self.assertEqual(
+            [ingredient.name
+             for ingredient in get_ingredient_index().search('со', 10)],
+            ['Соль', 'Соус']
+        )
+
+    def test_index_follows_catalog(self):
+        self.check_index()
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }})
+    def test_index_follows_catalog_without_cache(self):
+        self.check_index()
+
+
+class RenditionsMemoTest(TestCase):
+    '''
+    Names of images with generated renditions are memoized in a bounded
+    memo, which is cleared when renditions are deleted.
+    '''
+
+    def setUp(self):
+        generate_renditions.cache_clear()
+        file = io.BytesIO()
+        Image.new('RGB', (1000, 500)).save(file, 'JPEG')
+        self.name = default_storage.save('recipes/image.jpg',
+                                         ContentFile(file.getvalue()))
+        self.addCleanup(default_storage.delete, self.name)
+
+    def test_memo_is_bounded(self):
+        self.assertEqual(generate_renditions.cache_info().maxsize,
+                         RENDITIONS_MEMO_SIZE)
+
+    def test_renditions_are_memoized(self):
+        names = generate_renditions(self.name)
+        self.assertTrue(all(map(default_storage.exists, names.values())))
+        self.assertEqual(generate_renditions(self.name), names)
+        self.assertEqual(generate_renditions.cache_info().hits, 1)
+
+    def test_deleted_renditions_are_generated_again(self):
+        names = generate_renditions(self.name)
+        delete_renditions(self.name)
+        self.assertFalse(any(map(default_storage.exists, names.values())))
+        self.assertEqual(generate_renditions.cache_info().currsize, 0)
+        generate_renditions(self.name)
+        self.assertTrue(all(map(default_storage.exists, names.values())))
+        delete_renditions(self.name)
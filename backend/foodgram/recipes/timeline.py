@@ -0,0 +1,191 @@
+'''
+Materialized timelines of recipes by followed authors. New recipes are
+fanned out to timelines of followers after commit; recipes of authors
+with more than FEED_FANOUT_MAX_FOLLOWERS followers, and recipes written
+without signals, are pulled into the timeline when it is read.
+'''
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import UserSubscription
+from .models import Recipe, TimelineEntry
+
+WATERMARK_TIMEOUT = 60 * 60
+
+
+def _get_key(user_id):
+    return 'timeline:pulled:{}'.format(user_id)
+
+
+def _insert_entries(user_id, recipes, per_author=None):
+    '''
+    Insert recipes of queryset to the timeline of the user with a single
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING statement and return
+    number of inserted entries. With per_author only the latest
+    per_author recipes of every author are inserted.
+    '''
+    fields = ['id', 'author_id', 'created']
+    if per_author is not None:
+        recipes = recipes.annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('created').desc(), F('id').desc()],
+        ))
+        fields.append('position')
+    sql, params = recipes.values(*fields).query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(TimelineEntry._meta.get_field(name).column)
+                        for name in ('user', 'recipe', 'author', 'created'))
+    # The WHERE clause also resolves the parsing ambiguity of ON CONFLICT
+    # after SELECT in SQLite.
+    condition, condition_params = '1 = 1', []
+    if per_author is not None:
+        condition, condition_params = f'{quote("position")} <= %s', [
+            per_author
+        ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(TimelineEntry._meta.db_table)} ({columns}) '
+            f'SELECT %s, {quote("id")}, {quote("author_id")}, '
+            f'{quote("created")} FROM ({sql}) {quote("recipes")} '
+            f'WHERE {condition} ON CONFLICT DO NOTHING',
+            [user_id, *params, *condition_params]
+        )
+        return cursor.rowcount
+
+
+def fan_out(recipe_id):
+    '''
+    Write the recipe to timelines of the author's followers in batches
+    and mark it as fanned out. Recipes of authors with too many followers
+    are left to be pulled on read. Return number of written entries.
+    '''
+    recipe = Recipe.objects.filter(id=recipe_id).only(
+        'id', 'author_id', 'created'
+    ).first()
+    if recipe is None:
+        return 0
+    max_followers = settings.FEED_FANOUT_MAX_FOLLOWERS
+    followers = UserSubscription.objects.filter(
+        subscribed_id=recipe.author_id
+    ).order_by('subscriber_id').values_list('subscriber_id', flat=True)
+    follower_ids = list(followers[:max_followers + 1])
+    if len(follower_ids) > max_followers:
+        return 0
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    for start in range(0, len(follower_ids), batch_size):
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                          author_id=recipe.author_id, created=recipe.created)
+            for user_id in follower_ids[start:start + batch_size]
+        ], ignore_conflicts=True)
+    Recipe.objects.filter(id=recipe.id).update(fanned_out=True)
+    return len(follower_ids)
+
+
+def backfill_timeline(user_id, author_ids):
+    '''
+    Write latest FEED_BACKFILL_SIZE recipes of every author to the
+    timeline of the user with a single statement.
+    '''
+    author_ids = list(author_ids)
+    if author_ids:
+        _insert_entries(
+            user_id,
+            Recipe.objects.order_by().filter(author_id__in=author_ids),
+            per_author=settings.FEED_BACKFILL_SIZE
+        )
+
+
+def remove_from_timeline(user_id, author_ids):
+    ''' Remove recipes of the authors from the timeline of the user. '''
+    author_ids = list(author_ids)
+    if author_ids:
+        TimelineEntry.objects.filter(
+            user_id=user_id, author_id__in=author_ids
+        ).delete()
+
+
+def pull_timeline(user_id):
+    '''
+    Write recipes of followed authors, which are not fanned out and are
+    published since the last pull, to the timeline of the user. The pull
+    is skipped for FEED_PULL_INTERVAL seconds after the previous one, and
+    overlaps it by FEED_PULL_OVERLAP seconds to catch recipes committed
+    late. Without the watermark of the previous pull, e.g. after it is
+    evicted from the cache, only latest FEED_BACKFILL_SIZE recipes of
+    every author are written. Return number of written entries.
+    '''
+    key = _get_key(user_id)
+    now = timezone.now()
+    pulled = cache.get(key)
+    if (pulled is not None
+            and now - pulled < timedelta(seconds=settings.FEED_PULL_INTERVAL)):
+        return 0
+    recipes = Recipe.objects.order_by().filter(
+        fanned_out=False,
+        author_id__in=UserSubscription.objects.filter(
+            subscriber_id=user_id
+        ).values('subscribed_id'),
+    )
+    per_author = None
+    if pulled is not None:
+        recipes = recipes.filter(
+            created__gt=pulled - timedelta(seconds=settings.FEED_PULL_OVERLAP)
+        )
+    else:
+        per_author = settings.FEED_BACKFILL_SIZE
+    inserted = _insert_entries(user_id, recipes, per_author)
+    cache.set(key, now, WATERMARK_TIMEOUT)
+    return inserted
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, raw=False, **kwargs):
+    ''' Fan out the created recipe after the transaction commits. '''
+    if created and not raw:
+        transaction.on_commit(lambda: fan_out(instance.id))
+
+
+@receiver(post_save, sender=UserSubscription)
+def backfill_subscription(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.subscriber_id, [instance.subscribed_id])
+
+
+@receiver(post_delete, sender=UserSubscription)
+def remove_subscription(sender, instance, **kwargs):
+    remove_from_timeline(instance.subscriber_id, [instance.subscribed_id])
+
+
+@receiver(m2m_changed, sender=UserSubscription)
+def change_subscriptions(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    '''
+    Update timelines on changes made through :model:'users.User'
+    subscriptions manager, which bypass save signals of
+    :model:'users.UserSubscription'.
+    '''
+    if action == 'post_clear':
+        entries = TimelineEntry.objects.all()
+        if reverse:
+            entries.filter(author_id=instance.id).delete()
+        else:
+            entries.filter(user_id=instance.id).delete()
+    elif action in ('post_add', 'post_remove'):
+        change = (backfill_timeline if action == 'post_add'
+                  else remove_from_timeline)
+        if reverse:
+            for user_id in pk_set:
+                change(user_id, [instance.id])
+        else:
+            change(instance.id, pk_set)